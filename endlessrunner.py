@@ -1,6 +1,6 @@
 import pygame
 import random
-import os
+from scorestore import ScoreStore
 
 # Inicializando o Pygame
 pygame.init()
@@ -144,11 +144,9 @@ def show_game_over_screen(score):
                 waiting = False
 
 # Carregar highscore
-if os.path.exists("highscore.txt"):
-    with open("highscore.txt", "r") as file:
-        highscore = int(file.read())
-else:
-    highscore = 0
+SCORE_KEY = "endlessrunner"
+scores = ScoreStore()
+highscore = scores.best(SCORE_KEY)
 
 # Configurações do jogo
 player = Player()
@@ -229,10 +227,8 @@ while running:
     # Colisões
     if pygame.sprite.spritecollideany(player, obstacles) or pygame.sprite.spritecollideany(player, air_obstacles):
         game_active = False
-        if score > highscore:
-            highscore = score
-            with open("highscore.txt", "w") as file:
-                file.write(str(highscore))
+        scores.add(SCORE_KEY, score)
+        highscore = scores.best(SCORE_KEY)
         show_game_over_screen(score)
 
     # Coleta de moedas
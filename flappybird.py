@@ -1,17 +1,20 @@
+import argparse
+import multiprocessing
 import pygame
 import random
+import struct
 import sys
 import os
-import pickle
-
-pygame.init()
+import time
+from collections import deque
+from perf import format_timings, record_timing, run_jobs
+from scorestore import ScoreStore
 
 # Screen config
 SCREEN_WIDTH = 400
 SCREEN_HEIGHT = 600
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-clock = pygame.time.Clock()
-FONT = pygame.font.SysFont("Arial", 40)
+screen = None
+FONT = None
 
 # Colors
 WHITE = (255, 255, 255)
@@ -31,18 +34,36 @@ PROJECTILE_SPEED = 5
 PIPE_MIN_Y = 150
 PIPE_MAX_Y = SCREEN_HEIGHT - 150
 PIPE_SPAWN_TIME = 2500  # Timer for pipes to spawn
+PROJECTILE_SPAWN_TIME = 2000
+
+# The simulation always advances in ticks of the original 30 fps frame, so
+# difficulty no longer depends on how fast the game is drawn
+TICK_RATE = 30
+TICK = 1 / TICK_RATE
+PIPE_SPAWN_TICKS = PIPE_SPAWN_TIME * TICK_RATE // 1000
+PROJECTILE_SPAWN_TICKS = PROJECTILE_SPAWN_TIME * TICK_RATE // 1000
+DEFAULT_FPS = 60
+
+# Replay files: header, then the gap in ticks before each flap as a LEB128
+# varint, which is one byte for any realistic run
+REPLAY_MAGIC = b"FLPY"
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct("<4sBQIII")  # magic, version, seed, score, ticks, flap count
+REPLAY_SUFFIX = ".flr"
+HIGHSCORE_REPLAY = "highscore" + REPLAY_SUFFIX
 
-def load_highscore(filename="highscore.dat"):
-    if os.path.exists(filename):
-        with open(filename, 'rb') as f:
-            return pickle.load(f)
-    return 0
+SCORE_KEY = "flappybird"
+scores = None
+highscore = 0
 
-def save_highscore(highscore, filename="highscore.dat"):
-    with open(filename, 'wb') as f:
-        pickle.dump(highscore, f)
+def init_display():
+    global screen, FONT
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    FONT = pygame.font.SysFont("Arial", 40)
 
-highscore = load_highscore()
+def lerp(previous, current, alpha):
+    return round(previous + (current - previous) * alpha)
 
 def draw_text(text, font, color, surface, x, y):
     textobj = font.render(text, 1, color)
@@ -55,54 +76,61 @@ class Player(pygame.sprite.Sprite):
         self.image = pygame.Surface((30, 30))
         self.image.fill(YELLOW)
         self.rect = self.image.get_rect(center=(100, SCREEN_HEIGHT//2))
+        self.previous = self.rect.topleft
         self.velocity = 0
     
     def update(self):
+        self.previous = self.rect.topleft
         self.velocity += GRAVITY
         self.rect.y += self.velocity
-        if self.rect.bottom >= SCREEN_HEIGHT or self.rect.top <= 0:
-            self.kill()
+
+    def out_of_bounds(self):
+        return self.rect.bottom >= SCREEN_HEIGHT or self.rect.top <= 0
     
     def flap(self):
         self.velocity = FLAP_STRENGTH
 
+    def draw(self, surface, alpha):
+        surface.blit(self.image, (lerp(self.previous[0], self.rect.x, alpha), lerp(self.previous[1], self.rect.y, alpha)))
+
 class PipePair(pygame.sprite.Sprite):
-    def __init__(self, x):
+    def __init__(self, x, rng):
         super().__init__()
-        self.image = pygame.Surface((PIPE_WIDTH, SCREEN_HEIGHT))
-        self.image.set_colorkey(BLACK)
-        self.rect = self.image.get_rect(midtop=(x, 0))
-        self.pipe_gap_y = random.randint(PIPE_MIN_Y, PIPE_MAX_Y)
+        self.rect = pygame.Rect(x - PIPE_WIDTH//2, 0, PIPE_WIDTH, SCREEN_HEIGHT)
+        self.rng = rng
+        self.pipe_gap_y = rng.randint(PIPE_MIN_Y, PIPE_MAX_Y)
+        self.previous = (self.rect.x, self.pipe_gap_y)
+        # Moved in place by update rather than rebuilt for every check
+        self.top_rect = pygame.Rect(self.rect.x, self.pipe_gap_y - PIPE_HEIGHT - GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT)
+        self.bottom_rect = pygame.Rect(self.rect.x, self.pipe_gap_y + GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT)
         self.moving = False
         self.move_direction = 1
         self.distance_move = 0
         self.distance_counter = 0
     
     def update(self):
+        self.previous = (self.rect.x, self.pipe_gap_y)
         self.rect.x -= PIPE_MOVE_SPEED
+        self.top_rect.x = self.bottom_rect.x = self.rect.x
         if self.moving:
             if self.distance_counter == 0:
-                self.distance_move = random.randint(10, 30)
+                self.distance_move = self.rng.randint(10, 30)
             self.pipe_gap_y += self.move_direction
+            self.top_rect.y += self.move_direction
+            self.bottom_rect.y += self.move_direction
             self.distance_counter += 1
             if self.distance_counter >= self.distance_move:
                 self.move_direction *= -1
                 self.distance_counter = 0
-        
-        if self.rect.right < 0:
-            self.kill()
     
-    def draw(self, surface):
-        top_rect = pygame.Rect(self.rect.x, self.pipe_gap_y - PIPE_HEIGHT - GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT)
-        bottom_rect = pygame.Rect(self.rect.x, self.pipe_gap_y + GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT)
-        pygame.draw.rect(surface, GREEN, top_rect)
-        pygame.draw.rect(surface, GREEN, bottom_rect)
+    def draw(self, surface, alpha):
+        x = lerp(self.previous[0], self.rect.x, alpha)
+        gap_y = lerp(self.previous[1], self.pipe_gap_y, alpha)
+        pygame.draw.rect(surface, GREEN, (x, gap_y - PIPE_HEIGHT - GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT))
+        pygame.draw.rect(surface, GREEN, (x, gap_y + GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT))
     
     def check_collision(self, player):
-        player_rect = player.rect
-        top_rect = pygame.Rect(self.rect.x, self.pipe_gap_y - PIPE_HEIGHT - GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT)
-        bottom_rect = pygame.Rect(self.rect.x, self.pipe_gap_y + GAP_SIZE//2, PIPE_WIDTH, PIPE_HEIGHT)
-        return player_rect.colliderect(top_rect) or player_rect.colliderect(bottom_rect)
+        return player.rect.colliderect(self.top_rect) or player.rect.colliderect(self.bottom_rect)
 
 class Projectile(pygame.sprite.Sprite):
     def __init__(self, x, y):
@@ -110,81 +138,247 @@ class Projectile(pygame.sprite.Sprite):
         self.image = pygame.Surface((20, 5))
         self.image.fill(RED)
         self.rect = self.image.get_rect(center=(x, y))
+        self.previous = self.rect.x
     
     def update(self):
+        self.previous = self.rect.x
         self.rect.x -= PROJECTILE_SPEED
-        if self.rect.right < 0:
-            self.kill()
 
-def game():
-    global highscore
-    
-    player = Player()
-    all_sprites = pygame.sprite.Group(player)
-    pipes = pygame.sprite.Group()
-    projectiles = pygame.sprite.Group()
-    
-    # Timer for pipes and projectiles
-    pipe_timer = pygame.USEREVENT + 1
-    projectile_timer = pygame.USEREVENT + 2
-    pygame.time.set_timer(pipe_timer, PIPE_SPAWN_TIME)
-    pygame.time.set_timer(projectile_timer, 2000)
-
-    score = 0
-    running = True
-    while running:
+    def draw(self, surface, alpha):
+        surface.blit(self.image, (lerp(self.previous, self.rect.x, alpha), self.rect.y))
+
+class Simulation:
+    # One run, advanced a fixed tick at a time. All randomness comes from its
+    # own RNG, so a seed and the ticks the player flapped on replay exactly.
+    # Pipes and projectiles all move left at one speed, so deques in spawn
+    # order are also ordered by x: only the front of pipes can reach the
+    # player, and passed pipes wait in passed until they leave the screen.
+    def __init__(self, seed):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.player = Player()
+        self.passed = deque()
+        self.pipes = deque()
+        self.projectiles = deque()
+        self.tick = 0
+        self.score = 0
+        self.alive = True
+        self.timings = {}
+
+    def step(self, flap=False):
+        start = time.perf_counter()
+        if flap:
+            self.player.flap()
+        self.tick += 1
+        if self.tick % PIPE_SPAWN_TICKS == 0:
+            pipe_pair = PipePair(SCREEN_WIDTH, self.rng)
+            if self.score >= 15:
+                pipe_pair.moving = True
+            self.pipes.append(pipe_pair)
+        if self.tick % PROJECTILE_SPAWN_TICKS == 0 and self.score >= 30:
+            y = self.rng.randint(50, SCREEN_HEIGHT - 50)
+            self.projectiles.append(Projectile(SCREEN_WIDTH, y))
+
+        # Oldest first, the order moving pipes have always drawn from the RNG
+        self.player.update()
+        for pipe in self.passed:
+            pipe.update()
+        for pipe in self.pipes:
+            pipe.update()
+        for projectile in self.projectiles:
+            projectile.update()
+        while self.passed and self.passed[0].rect.right < 0:
+            self.passed.popleft()
+        while self.projectiles and self.projectiles[0].rect.right < 0:
+            self.projectiles.popleft()
+        record_timing(self.timings, "update", start)
+
+        start = time.perf_counter()
+        player = self.player
+        if player.out_of_bounds():
+            self.alive = False
+        if self.pipes and self.pipes[0].check_collision(player):
+            self.alive = False
+        for projectile in self.projectiles:
+            if projectile.rect.right > player.rect.left:
+                if player.rect.colliderect(projectile.rect):
+                    self.alive = False
+                break
+
+        # Score counting
+        while self.pipes and self.pipes[0].rect.right < player.rect.left:
+            self.passed.append(self.pipes.popleft())
+            self.score += 1
+        record_timing(self.timings, "collide", start)
+        return self.alive
+
+    def draw(self, surface, alpha):
+        # alpha is how far the clock is into the next tick
+        start = time.perf_counter()
+        surface.fill(BLACK)
+        self.player.draw(surface, alpha)
+        for pipe in self.passed:
+            pipe.draw(surface, alpha)
+        for pipe in self.pipes:
+            pipe.draw(surface, alpha)
+        for projectile in self.projectiles:
+            projectile.draw(surface, alpha)
+        draw_text(f'Score: {self.score}', FONT, WHITE, surface, SCREEN_WIDTH//2, 50)
+        record_timing(self.timings, "draw", start)
+
+def run(sim, fps, replay=None, speed=1.0):
+    # Steps sim in real time and draws it. With replay (a set of flap ticks)
+    # the keyboard only stops playback. Returns the ticks flapped on.
+    clock = pygame.time.Clock()
+    flaps = []
+    flap = False
+    lag = 0.0
+    previous = time.perf_counter()
+    while sim.alive:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    player.flap()
-            if event.type == pipe_timer:
-                pipe_pair = PipePair(SCREEN_WIDTH)
-                if score >= 15:
-                    pipe_pair.moving = True
-                pipes.add(pipe_pair)
-                all_sprites.add(pipe_pair)
-            if event.type == projectile_timer and score >= 30:
-                y = random.randint(50, SCREEN_HEIGHT - 50)
-                projectile = Projectile(SCREEN_WIDTH, y)
-                projectiles.add(projectile)
-                all_sprites.add(projectile)
-        
-        all_sprites.update()
-
-        # Check collisions
-        for pipe in pipes:
-            if pipe.check_collision(player):
-                running = False
-        
-        if pygame.sprite.spritecollideany(player, projectiles):
-            running = False
-        
-        screen.fill(BLACK)
-        for entity in all_sprites:
-            if isinstance(entity, PipePair):
-                entity.draw(screen)
-            else:
-                screen.blit(entity.image, entity.rect)
-        draw_text(f'Score: {score}', FONT, WHITE, screen, SCREEN_WIDTH//2, 50)
+                if event.key == pygame.K_SPACE and replay is None:
+                    flap = True
+                if event.key == pygame.K_ESCAPE and replay is not None:
+                    return flaps
+
+        # Run as many ticks as the wall clock owes; a long stall is capped
+        # rather than replayed all at once
+        now = time.perf_counter()
+        lag += min(now - previous, 0.25) * speed
+        previous = now
+        while lag >= TICK and sim.alive:
+            if replay is not None:
+                flap = sim.tick in replay
+            if flap:
+                flaps.append(sim.tick)
+            sim.step(flap)
+            flap = False
+            lag -= TICK
+
+        sim.draw(screen, lag / TICK)
         pygame.display.flip()
-        
-        # Score counting
-        passed_pipes = [pipe for pipe in pipes if pipe.rect.right < player.rect.left]
-        for pipe in passed_pipes:
-            pipes.remove(pipe)
-            score += 1
-        
-        clock.tick(30)
-    
-    if score > highscore:
-        highscore = score
-        save_highscore(highscore)
-        game_over(screen, score, True)
-    else:
-        game_over(screen, score, False)
+        clock.tick(fps)
+    return flaps
+
+def game(fps=DEFAULT_FPS, seed=None, profile=False, record=None):
+    global highscore
+
+    sim = Simulation(random.randrange(2 ** 32) if seed is None else seed)
+    flaps = run(sim, fps)
+
+    if profile:
+        print(format_timings(sim.timings))
+    if record:
+        os.makedirs(record, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{sim.seed}-{sim.score}{REPLAY_SUFFIX}"
+        save_replay(os.path.join(record, name), sim.seed, flaps, sim.score, sim.tick)
+
+    score = sim.score
+    new_highscore = scores.add(SCORE_KEY, score)
+    # Another instance may have raised the best meanwhile
+    highscore = scores.best(SCORE_KEY)
+    if new_highscore:
+        save_replay(HIGHSCORE_REPLAY, sim.seed, flaps, sim.score, sim.tick)
+    game_over(screen, score, new_highscore)
+
+def save_replay(path, seed, flaps, score, ticks):
+    data = bytearray(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, score, ticks, len(flaps)))
+    last = 0
+    for tick in flaps:
+        gap = tick - last
+        last = tick
+        while gap >= 0x80:
+            data.append(gap & 0x7F | 0x80)
+            gap >>= 7
+        data.append(gap)
+    # Written beside the target and renamed, so a crash never leaves half a file
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+def load_replay(path):
+    # Returns (seed, flap ticks, claimed score, claimed ticks)
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < REPLAY_HEADER.size:
+        raise ValueError(f"{path} is not a flappybird replay")
+    magic, version, seed, score, ticks, count = REPLAY_HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError(f"{path} is not a flappybird replay")
+    flaps = []
+    tick = gap = shift = 0
+    for byte in data[REPLAY_HEADER.size:]:
+        gap |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            tick += gap
+            flaps.append(tick)
+            gap = shift = 0
+    if len(flaps) != count:
+        raise ValueError(f"{path} is truncated")
+    return seed, flaps, score, ticks
+
+def simulate_replay(seed, flaps, max_ticks):
+    # Re-runs a replay headlessly, stopping at max_ticks if it is still alive
+    sim = Simulation(seed)
+    flaps = set(flaps)
+    while sim.alive and sim.tick < max_ticks:
+        sim.step(sim.tick in flaps)
+    return sim
+
+def verify_replay(path):
+    # Returns (path, claimed score, actual score, ticks, error); a replay
+    # checks out when the run ends on its claimed tick with its claimed score
+    try:
+        seed, flaps, score, ticks = load_replay(path)
+    except (OSError, ValueError) as error:
+        return path, None, None, 0, str(error)
+    sim = simulate_replay(seed, flaps, ticks)
+    if sim.alive or sim.tick != ticks or sim.score != score:
+        state = "still alive" if sim.alive else f"died on tick {sim.tick}"
+        return path, score, sim.score, sim.tick, f"{state} with score {sim.score}, claimed {score} at tick {ticks}"
+    return path, score, sim.score, sim.tick, None
+
+def replay_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(REPLAY_SUFFIX):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+def verify_replays(paths, workers):
+    return run_jobs(verify_replay, paths, workers, chunksize=16)
+
+def verify_command(args):
+    paths = list(replay_paths(args.replays))
+    start = time.perf_counter()
+    failed = ticks = 0
+    for path, claimed, actual, run_ticks, error in verify_replays(paths, args.workers):
+        ticks += run_ticks
+        if error:
+            failed += 1
+            print(f"FAIL {path}: {error}")
+        elif args.verbose:
+            print(f"ok   {path}: score {actual}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths) - failed}/{len(paths)} replays verified, {ticks} ticks in {elapsed:.2f} s "
+          f"({ticks * TICK / max(elapsed, 1e-9):.0f}x real time)")
+    if failed:
+        sys.exit(1)
+
+def watch_command(args):
+    seed, flaps, score, ticks = load_replay(args.replay)
+    init_display()
+    pygame.display.set_caption(f"Replay: seed {seed}, score {score}")
+    sim = Simulation(seed)
+    run(sim, args.fps, replay=set(flaps), speed=args.speed)
+    print(f"replay ended on tick {sim.tick} with score {sim.score} (claimed {score} at tick {ticks})")
 
 def game_over(screen, score, new_highscore):
     screen.fill(BLACK)
@@ -222,7 +416,29 @@ def main_menu():
                 if event.key == pygame.K_SPACE:
                     waiting = False
 
-# Main loop
-while True:
-    main_menu()
-    game()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="flappybird")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="render rate; the simulation always runs at 30 ticks/s")
+    parser.add_argument("--seed", type=int, help="seed for every run, for a repeatable course")
+    parser.add_argument("--profile", action="store_true", help="print update/collide/draw timings after each run")
+    parser.add_argument("--record", metavar="DIR", help="save a replay of every run in DIR")
+    commands = parser.add_subparsers(dest="command")
+    verify = commands.add_parser("verify", help="re-simulate replays headlessly and check their scores")
+    verify.add_argument("replays", nargs="+", help="replay files or directories of them")
+    verify.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    verify.add_argument("--verbose", action="store_true")
+    verify.set_defaults(func=verify_command)
+    watch = commands.add_parser("watch", help="play a replay back in the window")
+    watch.add_argument("replay")
+    watch.add_argument("--speed", type=float, default=1.0)
+    watch.set_defaults(func=watch_command)
+    args = parser.parse_args()
+    if args.command:
+        args.func(args)
+    else:
+        init_display()
+        scores = ScoreStore()
+        highscore = scores.best(SCORE_KEY)
+        while True:
+            main_menu()
+            game(args.fps, args.seed, args.profile, args.record)
@@ -0,0 +1,189 @@
+import argparse
+import time
+from flappybird import (SCREEN_HEIGHT, SCREEN_WIDTH, GRAVITY, FLAP_STRENGTH, PIPE_WIDTH, PIPE_HEIGHT, GAP_SIZE,
+                        PIPE_MOVE_SPEED, PROJECTILE_SPEED, PIPE_MIN_Y, PIPE_MAX_Y, PIPE_SPAWN_TICKS,
+                        PROJECTILE_SPAWN_TICKS)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Headless Flappy Square for training: N independent games advanced together,
+# one Simulation tick per step, with every sprite's state held in NumPy arrays.
+# Rect geometry matches the sprites in flappybird: the player is a 30x30 rect
+# whose top-left starts at (85, 285), each pipe pair is two PIPE_WIDTH x
+# PIPE_HEIGHT rects around its gap, and projectiles are 20x5.
+
+PLAYER_X = 100 - 15
+PLAYER_START_Y = SCREEN_HEIGHT // 2 - 15
+PLAYER_SIZE = 30
+PIPE_START_X = SCREEN_WIDTH - PIPE_WIDTH // 2
+PROJECTILE_WIDTH, PROJECTILE_HEIGHT = 20, 5
+PROJECTILE_START_X = SCREEN_WIDTH - PROJECTILE_WIDTH // 2
+# A pipe lives 145 ticks and a projectile 82, so three slots of each is enough
+SLOTS = 3
+OBSERVATION_SIZE = 6
+
+class FlappyEnv:
+    def __init__(self, games, seed=None):
+        if np is None:
+            raise RuntimeError("FlappyEnv requires numpy")
+        self.games = games
+        self.rng = np.random.default_rng(seed)
+        shape = (games, SLOTS)
+        self.tick = np.zeros(games, dtype=np.int64)
+        self.score = np.zeros(games, dtype=np.int64)
+        self.y = np.zeros(games, dtype=np.float64)
+        self.velocity = np.zeros(games, dtype=np.float64)
+        self.pipe_x = np.zeros(shape, dtype=np.int64)
+        self.pipe_gap_y = np.zeros(shape, dtype=np.int64)
+        # pipe_live: still on screen; pipe_active: live and not yet scored,
+        # the same set PipePair sprites in Simulation.pipes cover
+        self.pipe_live = np.zeros(shape, dtype=bool)
+        self.pipe_active = np.zeros(shape, dtype=bool)
+        self.pipe_moving = np.zeros(shape, dtype=bool)
+        self.pipe_direction = np.ones(shape, dtype=np.int64)
+        self.pipe_counter = np.zeros(shape, dtype=np.int64)
+        self.pipe_distance = np.zeros(shape, dtype=np.int64)
+        self.pipe_spawned = np.zeros(games, dtype=np.int64)
+        self.projectile_x = np.zeros(shape, dtype=np.int64)
+        self.projectile_y = np.zeros(shape, dtype=np.int64)
+        self.projectile_live = np.zeros(shape, dtype=bool)
+        self.projectile_spawned = np.zeros(games, dtype=np.int64)
+        self.rows = np.arange(games)
+
+    def reset(self, mask=None):
+        # Restarts every game, or only those where mask is set
+        if mask is None:
+            mask = np.ones(self.games, dtype=bool)
+        self.tick[mask] = 0
+        self.score[mask] = 0
+        self.y[mask] = PLAYER_START_Y
+        self.velocity[mask] = 0
+        self.pipe_live[mask] = False
+        self.pipe_active[mask] = False
+        self.pipe_spawned[mask] = 0
+        self.projectile_live[mask] = False
+        self.projectile_spawned[mask] = 0
+        return self.observe()
+
+    def spawn(self):
+        rows = np.flatnonzero(self.tick % PIPE_SPAWN_TICKS == 0)
+        if len(rows):
+            slots = self.pipe_spawned[rows] % SLOTS
+            self.pipe_spawned[rows] += 1
+            self.pipe_x[rows, slots] = PIPE_START_X
+            self.pipe_gap_y[rows, slots] = self.rng.integers(PIPE_MIN_Y, PIPE_MAX_Y + 1, len(rows))
+            self.pipe_live[rows, slots] = True
+            self.pipe_active[rows, slots] = True
+            self.pipe_moving[rows, slots] = self.score[rows] >= 15
+            self.pipe_direction[rows, slots] = 1
+            self.pipe_counter[rows, slots] = 0
+        rows = np.flatnonzero((self.tick % PROJECTILE_SPAWN_TICKS == 0) & (self.score >= 30))
+        if len(rows):
+            slots = self.projectile_spawned[rows] % SLOTS
+            self.projectile_spawned[rows] += 1
+            self.projectile_x[rows, slots] = PROJECTILE_START_X
+            self.projectile_y[rows, slots] = self.rng.integers(50, SCREEN_HEIGHT - 50 + 1, len(rows)) - PROJECTILE_HEIGHT // 2
+            self.projectile_live[rows, slots] = True
+
+    def move(self, flaps):
+        self.velocity[flaps] = FLAP_STRENGTH
+        self.velocity += GRAVITY
+        # pygame rounds half up when a float is added to a Rect coordinate
+        self.y = np.floor(self.y + self.velocity + 0.5)
+
+        self.pipe_x[self.pipe_live] -= PIPE_MOVE_SPEED
+        moving = self.pipe_moving & self.pipe_live
+        starting = moving & (self.pipe_counter == 0)
+        if starting.any():
+            self.pipe_distance[starting] = self.rng.integers(10, 31, int(starting.sum()))
+        self.pipe_gap_y += np.where(moving, self.pipe_direction, 0)
+        self.pipe_counter += moving
+        turning = moving & (self.pipe_counter >= self.pipe_distance)
+        self.pipe_direction[turning] *= -1
+        self.pipe_counter[turning] = 0
+        self.pipe_live &= self.pipe_x + PIPE_WIDTH >= 0
+        self.pipe_active &= self.pipe_live
+
+        self.projectile_x[self.projectile_live] -= PROJECTILE_SPEED
+        self.projectile_live &= self.projectile_x + PROJECTILE_WIDTH >= 0
+
+    def collide(self):
+        # Rect.colliderect on the player against both pipe rects and every
+        # projectile, for all games at once
+        top = self.y[:, None]
+        bottom = top + PLAYER_SIZE
+        pipe_x = (PLAYER_X < self.pipe_x + PIPE_WIDTH) & (self.pipe_x < PLAYER_X + PLAYER_SIZE)
+        upper_top = self.pipe_gap_y - PIPE_HEIGHT - GAP_SIZE // 2
+        lower_top = self.pipe_gap_y + GAP_SIZE // 2
+        upper = (top < upper_top + PIPE_HEIGHT) & (upper_top < bottom)
+        lower = (top < lower_top + PIPE_HEIGHT) & (lower_top < bottom)
+        hit = (self.pipe_active & pipe_x & (upper | lower)).any(axis=1)
+        hit |= (self.projectile_live &
+                (PLAYER_X < self.projectile_x + PROJECTILE_WIDTH) & (self.projectile_x < PLAYER_X + PLAYER_SIZE) &
+                (top < self.projectile_y + PROJECTILE_HEIGHT) & (self.projectile_y < bottom)).any(axis=1)
+        hit |= (self.y + PLAYER_SIZE >= SCREEN_HEIGHT) | (self.y <= 0)
+        return hit
+
+    def step(self, actions):
+        # actions: one flap flag per game. Returns (observations, rewards,
+        # dones, scores); rewards are pipes passed this tick, scores are the
+        # final scores of games that just ended, and finished games restart.
+        flaps = np.asarray(actions, dtype=bool)
+        self.tick += 1
+        self.spawn()
+        self.move(flaps)
+        dones = self.collide()
+        passed = self.pipe_active & (self.pipe_x + PIPE_WIDTH < PLAYER_X)
+        self.pipe_active &= ~passed
+        rewards = passed.sum(axis=1)
+        self.score += rewards
+        scores = np.where(dones, self.score, 0)
+        if dones.any():
+            self.reset(dones)
+        return self.observe(), rewards, dones, scores
+
+    def observe(self):
+        # Player y and velocity, the next unscored pipe's distance and gap,
+        # and the nearest projectile's offset; distances are SCREEN_WIDTH
+        # when there is nothing ahead
+        observations = np.empty((self.games, OBSERVATION_SIZE), dtype=np.float32)
+        observations[:, 0] = self.y
+        observations[:, 1] = self.velocity
+        pipe_x = np.where(self.pipe_active, self.pipe_x, SCREEN_WIDTH + PIPE_WIDTH)
+        nearest = pipe_x.argmin(axis=1)
+        observations[:, 2] = pipe_x[self.rows, nearest] - PLAYER_X
+        observations[:, 3] = np.where(self.pipe_active[self.rows, nearest],
+                                      self.pipe_gap_y[self.rows, nearest], SCREEN_HEIGHT // 2)
+        projectile_x = np.where(self.projectile_live, self.projectile_x, SCREEN_WIDTH + PROJECTILE_WIDTH)
+        nearest = projectile_x.argmin(axis=1)
+        observations[:, 4] = projectile_x[self.rows, nearest] - PLAYER_X
+        observations[:, 5] = np.where(self.projectile_live[self.rows, nearest],
+                                      self.projectile_y[self.rows, nearest] - self.y, 0)
+        return observations
+
+def benchmark(games, steps, seed):
+    # Flaps when the player is below the next gap, a rough stand-in agent
+    env = FlappyEnv(games, seed)
+    observations = env.reset()
+    ended = total = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = (observations[:, 0] + PLAYER_SIZE // 2 > observations[:, 3] + 30) & (observations[:, 1] > 0)
+        observations, rewards, dones, scores = env.step(actions)
+        ended += int(dones.sum())
+        total += int(scores.sum())
+    elapsed = time.perf_counter() - start
+    print(f"{games * steps} game steps in {elapsed:.2f} s ({games * steps / elapsed:.0f} steps/s)")
+    if ended:
+        print(f"{ended} games finished, mean score {total / ended:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="flappybird_env")
+    parser.add_argument("--games", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    benchmark(args.games, args.steps, args.seed)
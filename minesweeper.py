@@ -2,8 +2,15 @@ import pygame
 import sys
 import random
 import time
+import argparse
+import multiprocessing
+from collections import defaultdict
+from perf import format_timings, merge_timings, record_timing, run_jobs, seeded_jobs
 
-pygame.init()
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Colors
 WHITE = (255, 255, 255)
@@ -20,25 +27,64 @@ DIFFICULTIES = {
     'hard': {'size': 32, 'bombs': 160, 'cell_size': 20}
 }
 
-class Minesweeper:
-    def __init__(self, difficulty):
-        self.size = DIFFICULTIES[difficulty]['size']
-        self.bombs = DIFFICULTIES[difficulty]['bombs']
-        self.cell_size = DIFFICULTIES[difficulty]['cell_size']
-        self.grid = [[0 for _ in range(self.size)] for _ in range(self.size)]
-        self.revealed = [[False for _ in range(self.size)] for _ in range(self.size)]
-        self.flagged = [[False for _ in range(self.size)] for _ in range(self.size)]
+NUMBER_GLYPHS = {}
+
+def number_glyphs(cell_size):
+    # Digits 1-8 rendered once per cell size; index 0 is unused
+    if cell_size not in NUMBER_GLYPHS:
+        font = pygame.font.SysFont(None, cell_size)
+        NUMBER_GLYPHS[cell_size] = [None] + [font.render(str(n), True, BLACK) for n in range(1, 9)]
+    return NUMBER_GLYPHS[cell_size]
+
+class MinesweeperBoard:
+    # Game rules only, no pygame, so boards can be played headlessly.
+    # difficulty is a DIFFICULTIES key or a dict with the same fields.
+    # vectorized=True keeps the board in NumPy arrays, which makes setup of
+    # very large boards fast; cells are still indexed as grid[y][x].
+    # safe_start=True places bombs on the first reveal, away from it;
+    # no_guess=True also regenerates (up to max_attempts) until the
+    # AutoPlayer can clear the board from that click without guessing.
+    def __init__(self, difficulty, vectorized=False, safe_start=False, no_guess=False, max_attempts=100):
+        config = DIFFICULTIES[difficulty] if isinstance(difficulty, str) else difficulty
+        self.size = config['size']
+        self.bombs = config['bombs']
+        self.vectorized = vectorized
+        self.safe_start = safe_start or no_guess
+        cells = self.size * self.size - self.safe_start
+        if not 0 <= self.bombs <= cells:
+            raise ValueError(f"{self.bombs} bombs do not fit on a {self.size}x{self.size} board"
+                             + (" with a safe first click" if self.safe_start else ""))
+        self.no_guess = no_guess
+        self.max_attempts = max_attempts
+        self.generation_attempts = 0
+        self.generation_time = 0.0
+        if vectorized:
+            if np is None:
+                raise RuntimeError("vectorized boards require numpy")
+            self.grid = np.zeros((self.size, self.size), dtype=np.int8)
+            self.revealed = np.zeros((self.size, self.size), dtype=bool)
+            self.flagged = np.zeros((self.size, self.size), dtype=bool)
+        else:
+            self.grid = [[0 for _ in range(self.size)] for _ in range(self.size)]
+            self.revealed = [[False for _ in range(self.size)] for _ in range(self.size)]
+            self.flagged = [[False for _ in range(self.size)] for _ in range(self.size)]
+        self.revealed_safe = 0
+        self.flag_count = 0
+        self.changed = set()
+        self.timings = {}
         self.game_over = False
         self.victory = False
         self.start_time = None
-        self.place_bombs()
-        self.calculate_numbers()
-        self.screen_size = self.size * self.cell_size
-        self.screen = pygame.display.set_mode((self.screen_size, self.screen_size + 100))
-        pygame.display.set_caption('Campo Minado')
-        self.font = pygame.font.SysFont(None, 36)
+        self.bombs_placed = not self.safe_start
+        if self.bombs_placed:
+            self.place_bombs()
+            self.calculate_numbers()
 
     def place_bombs(self):
+        if self.vectorized:
+            cells = np.random.choice(self.size * self.size, self.bombs, replace=False)
+            self.grid.flat[cells] = -1
+            return
         count = 0
         while count < self.bombs:
             x = random.randint(0, self.size - 1)
@@ -47,7 +93,54 @@ class Minesweeper:
                 self.grid[y][x] = -1
                 count += 1
 
+    def place_bombs_around(self, x, y):
+        # O(bombs) sampling over flat indices, skipping the 3x3 block around
+        # the first click by shifting each sample past the excluded cells.
+        # Boards too dense for that only keep the clicked cell itself safe.
+        excluded = sorted(ny * self.size + nx for nx, ny in self.neighbors(x, y) + [(x, y)])
+        if self.bombs > self.size * self.size - len(excluded):
+            excluded = [y * self.size + x]
+        cells = random.sample(range(self.size * self.size - len(excluded)), self.bombs)
+        for i, cell in enumerate(cells):
+            for e in excluded:
+                if cell >= e:
+                    cell += 1
+            cells[i] = cell
+        if self.vectorized:
+            self.grid = np.zeros((self.size, self.size), dtype=np.int8)
+            self.grid.flat[cells] = -1
+        else:
+            self.grid = [[0 for _ in range(self.size)] for _ in range(self.size)]
+            for cell in cells:
+                self.grid[cell // self.size][cell % self.size] = -1
+
+    def generate(self, x, y):
+        start = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            self.place_bombs_around(x, y)
+            self.calculate_numbers()
+            if not self.no_guess or self.solvable_from(x, y):
+                break
+        self.generation_attempts = attempt
+        self.generation_time = time.perf_counter() - start
+        self.bombs_placed = True
+
+    def solvable_from(self, x, y):
+        trial = MinesweeperBoard({'size': self.size, 'bombs': self.bombs}, safe_start=True)
+        trial.grid = [list(row) for row in self.grid]
+        trial.bombs_placed = True
+        return AutoPlayer(trial).clear_without_guessing(x, y)
+
     def calculate_numbers(self):
+        if self.vectorized:
+            bombs = self.grid == -1
+            padded = np.pad(bombs, 1).astype(np.int8)
+            counts = np.zeros((self.size, self.size), dtype=np.int8)
+            for dy in range(3):
+                for dx in range(3):
+                    counts += padded[dy:dy + self.size, dx:dx + self.size]
+            self.grid = np.where(bombs, np.int8(-1), counts)
+            return
         for y in range(self.size):
             for x in range(self.size):
                 if self.grid[y][x] == -1:
@@ -60,66 +153,347 @@ class Minesweeper:
                 self.grid[y][x] = bombs_count
 
     def reveal(self, x, y):
+        self.reveal_many([(x, y)], "reveal")
+
+    def reveal_many(self, cells, action="reveal_many"):
+        # Applies a batch of reveals as one flood fill and one victory check
         if self.start_time is None:
             self.start_time = time.time()
-        if self.grid[y][x] == -1:
-            self.game_over = True
-        self.revealed[y][x] = True
-        if self.grid[y][x] == 0:
-            for nx in range(max(0, x-1), min(self.size, x+2)):
-                for ny in range(max(0, y-1), min(self.size, y+2)):
-                    if not self.revealed[ny][nx]:
-                        self.reveal(nx, ny)
+        if cells and not self.bombs_placed:
+            self.generate(*cells[0])
+        # Generation is timed on its own, in generation_time
+        start = time.perf_counter()
+        safe = []
+        for x, y in cells:
+            if self.revealed[y][x] or self.flagged[y][x]:
+                continue
+            if self.grid[y][x] == -1:
+                self.game_over = True
+                self.revealed[y][x] = True
+                self.changed.add((x, y))
+            else:
+                safe.append((x, y))
+        self.flood_reveal(safe)
         self.check_victory()
+        record_timing(self.timings, action, start)
+
+    def chord(self, x, y):
+        # On a revealed number whose flags are all placed, reveal the rest
+        # of its neighbours
+        if not self.revealed[y][x] or self.grid[y][x] <= 0:
+            return
+        neighbors = self.neighbors(x, y)
+        if sum(self.flagged[ny][nx] for nx, ny in neighbors) == self.grid[y][x]:
+            self.reveal_many(neighbors, "chord")
+
+    def flood_reveal(self, cells):
+        # Explicit stack instead of recursion, so large empty regions cannot
+        # hit the recursion limit; each safe cell is counted once
+        stack = list(cells)
+        while stack:
+            x, y = stack.pop()
+            if self.revealed[y][x]:
+                continue
+            self.revealed[y][x] = True
+            self.revealed_safe += 1
+            self.changed.add((x, y))
+            if self.grid[y][x] == 0:
+                for nx in range(max(0, x-1), min(self.size, x+2)):
+                    for ny in range(max(0, y-1), min(self.size, y+2)):
+                        if not self.revealed[ny][nx] and not self.flagged[ny][nx]:
+                            stack.append((nx, ny))
 
     def flag(self, x, y):
+        start = time.perf_counter()
         self.flagged[y][x] = not self.flagged[y][x]
+        self.flag_count += 1 if self.flagged[y][x] else -1
+        self.changed.add((x, y))
         self.check_victory()
+        record_timing(self.timings, "flag", start)
 
     def check_victory(self):
-        if all(
-            (self.revealed[y][x] or self.flagged[y][x]) and
-            (self.grid[y][x] != -1 or self.flagged[y][x])
-            for y in range(self.size)
-            for x in range(self.size)
-        ):
+        if self.revealed_safe == self.size * self.size - self.bombs:
             self.victory = True
 
-    def draw(self):
-        self.screen.fill(WHITE)
+    def neighbors(self, x, y):
+        return [(nx, ny)
+                for ny in range(max(0, y-1), min(self.size, y+2))
+                for nx in range(max(0, x-1), min(self.size, x+2))
+                if nx != x or ny != y]
+
+class AutoPlayer:
+    # Plays a board using only what a player can see: single-point and
+    # subset deductions, and the least risky cell when it has to guess
+    def __init__(self, board):
+        self.board = board
+        self.frontier = set()
+        self.guesses = 0
+        self.moves = 0
+
+    def absorb_changes(self):
+        # Newly revealed number cells become constraints; the board's
+        # changed set is otherwise only drained by the renderer
+        for x, y in self.board.changed:
+            if self.board.revealed[y][x] and self.board.grid[y][x] > 0:
+                self.frontier.add((x, y))
+        self.board.changed.clear()
+
+    def constraints(self):
+        board = self.board
+        result = set()
+        for x, y in list(self.frontier):
+            unknown = []
+            flags = 0
+            for nx, ny in board.neighbors(x, y):
+                if board.flagged[ny][nx]:
+                    flags += 1
+                elif not board.revealed[ny][nx]:
+                    unknown.append((nx, ny))
+            if unknown:
+                result.add((frozenset(unknown), board.grid[y][x] - flags))
+            else:
+                self.frontier.discard((x, y))
+        return list(result)
+
+    def deduce(self, constraints):
+        safe, mines = set(), set()
+        for cells, count in constraints:
+            if count == 0:
+                safe |= cells
+            elif count == len(cells):
+                mines |= cells
+        if safe or mines:
+            return safe, mines
+        by_cell = defaultdict(list)
+        for constraint in constraints:
+            for cell in constraint[0]:
+                by_cell[cell].append(constraint)
+        for small, small_count in constraints:
+            overlapping = {c for cell in small for c in by_cell[cell]}
+            for big, big_count in overlapping:
+                if small < big:
+                    rest = big - small
+                    if big_count == small_count:
+                        safe |= rest
+                    elif big_count - small_count == len(rest):
+                        mines |= rest
+        return safe, mines
+
+    def guess(self, constraints):
+        board = self.board
+        risk = {}
+        for cells, count in constraints:
+            for cell in cells:
+                risk[cell] = max(risk.get(cell, 0), count / len(cells))
+        unknown = [(x, y) for y in range(board.size) for x in range(board.size)
+                   if not board.revealed[y][x] and not board.flagged[y][x]]
+        density = (board.bombs - board.flag_count) / len(unknown)
+        lowest = min(risk.get(cell, density) for cell in unknown)
+        return random.choice([cell for cell in unknown if risk.get(cell, density) == lowest])
+
+    def step(self):
+        constraints = self.constraints()
+        safe, mines = self.deduce(constraints)
+        if not safe and not mines:
+            self.guesses += 1
+            safe = [self.guess(constraints)]
+        for x, y in mines:
+            if not self.board.flagged[y][x]:
+                self.board.flag(x, y)
+        self.board.reveal_many(list(safe))
+        self.moves += 1
+        self.absorb_changes()
+
+    def play(self):
+        while not self.board.game_over and not self.board.victory:
+            self.step()
+        return self.board.victory
+
+    def clear_without_guessing(self, x, y):
+        self.board.reveal(x, y)
+        self.absorb_changes()
+        while not self.board.game_over and not self.board.victory:
+            safe, mines = self.deduce(self.constraints())
+            if not safe and not mines:
+                return False
+            for mx, my in mines:
+                if not self.board.flagged[my][mx]:
+                    self.board.flag(mx, my)
+            self.board.reveal_many(list(safe))
+            self.absorb_changes()
+        return self.board.victory
+
+# Infinite mode: the world is split into CHUNK_SIZE x CHUNK_SIZE chunks that
+# are only created when play touches them, each seeded from its coordinates
+CHUNK_SIZE = 16
+INFINITE = {'density': 0.16, 'cell_size': 25, 'width': 800, 'height': 600}
+
+class Chunk:
+    def __init__(self, bombs):
+        self.bombs = bombs
+        self.revealed = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+        self.flagged = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+
+class InfiniteBoard:
+    # density must stay well above zero or empty regions stop being finite;
+    # flood_limit bounds a single reveal regardless
+    def __init__(self, seed=None, density=INFINITE['density'], flood_limit=100000):
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.density = density
+        self.flood_limit = flood_limit
+        self.chunks = {}
+        self.safe_zone = set()
+        self.revealed_safe = 0
+        self.flag_count = 0
+        self.changed = set()
+        self.game_over = False
+        self.start_time = None
+
+    def chunk(self, x, y, create=True):
+        key = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+        chunk = self.chunks.get(key)
+        if chunk is None and create:
+            rng = random.Random(f"{self.seed}:{key[0]}:{key[1]}")
+            chunk = self.chunks[key] = Chunk(bytearray(rng.random() < self.density for _ in range(CHUNK_SIZE * CHUNK_SIZE)))
+        return chunk
+
+    def index(self, x, y):
+        return (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+
+    def neighbors(self, x, y):
+        return [(x + dx, y + dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+
+    def is_bomb(self, x, y):
+        if (x, y) in self.safe_zone:
+            return False
+        return self.chunk(x, y).bombs[self.index(x, y)]
+
+    def number(self, x, y):
+        return sum(self.is_bomb(nx, ny) for nx, ny in self.neighbors(x, y))
+
+    def is_revealed(self, x, y):
+        chunk = self.chunk(x, y, create=False)
+        return chunk is not None and chunk.revealed[self.index(x, y)]
+
+    def is_flagged(self, x, y):
+        chunk = self.chunk(x, y, create=False)
+        return chunk is not None and chunk.flagged[self.index(x, y)]
+
+    def reveal(self, x, y):
+        if self.start_time is None:
+            self.start_time = time.time()
+            self.safe_zone = set(self.neighbors(x, y)) | {(x, y)}
+        if self.is_revealed(x, y) or self.is_flagged(x, y):
+            return
+        if self.is_bomb(x, y):
+            self.game_over = True
+            self.chunk(x, y).revealed[self.index(x, y)] = 1
+            self.changed.add((x, y))
+            return
+        self.flood_reveal([(x, y)])
+
+    def flood_reveal(self, cells):
+        stack = list(cells)
+        revealed = 0
+        while stack and revealed < self.flood_limit:
+            x, y = stack.pop()
+            chunk = self.chunk(x, y)
+            i = self.index(x, y)
+            if chunk.revealed[i]:
+                continue
+            chunk.revealed[i] = 1
+            revealed += 1
+            self.changed.add((x, y))
+            if self.number(x, y) == 0:
+                for nx, ny in self.neighbors(x, y):
+                    if not self.is_revealed(nx, ny) and not self.is_flagged(nx, ny):
+                        stack.append((nx, ny))
+        self.revealed_safe += revealed
+
+    def flag(self, x, y):
+        if self.is_revealed(x, y):
+            return
+        chunk = self.chunk(x, y)
+        i = self.index(x, y)
+        chunk.flagged[i] ^= 1
+        self.flag_count += 1 if chunk.flagged[i] else -1
+        self.changed.add((x, y))
+
+    def chord(self, x, y):
+        if not self.is_revealed(x, y) or self.is_bomb(x, y):
+            return
+        neighbors = self.neighbors(x, y)
+        if sum(self.is_flagged(nx, ny) for nx, ny in neighbors) == self.number(x, y):
+            for nx, ny in neighbors:
+                self.reveal(nx, ny)
+
+class Minesweeper(MinesweeperBoard):
+    def __init__(self, difficulty, vectorized=False, safe_start=True, no_guess=False):
+        super().__init__(difficulty, vectorized, safe_start, no_guess)
+        config = DIFFICULTIES[difficulty] if isinstance(difficulty, str) else difficulty
+        self.cell_size = config['cell_size']
+        self.screen_size = self.size * self.cell_size
+        self.screen = pygame.display.set_mode((self.screen_size, self.screen_size + 100))
+        pygame.display.set_caption('Campo Minado')
+        self.font = pygame.font.SysFont(None, 36)
+        self.glyphs = number_glyphs(self.cell_size)
+        self.board_surface = pygame.Surface((self.screen_size, self.screen_size))
         for y in range(self.size):
             for x in range(self.size):
-                rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
-                if self.revealed[y][x]:
-                    if self.grid[y][x] == -1:
-                        pygame.draw.rect(self.screen, RED, rect)
-                    else:
-                        pygame.draw.rect(self.screen, GRAY, rect)
-                        if self.grid[y][x] > 0:
-                            font = pygame.font.SysFont(None, self.cell_size)
-                            img = font.render(str(self.grid[y][x]), True, BLACK)
-                            self.screen.blit(img, (x * self.cell_size + self.cell_size // 3, y * self.cell_size))
-                else:
-                    pygame.draw.rect(self.screen, WHITE, rect)
-                    pygame.draw.rect(self.screen, BLACK, rect, 1)
-                    if self.flagged[y][x]:
-                        pygame.draw.line(self.screen, BLACK, (x * self.cell_size, y * self.cell_size),
-                                         (x * self.cell_size + self.cell_size, y * self.cell_size + self.cell_size), 2)
-                        pygame.draw.line(self.screen, BLACK, (x * self.cell_size + self.cell_size, y * self.cell_size),
-                                         (x * self.cell_size, y * self.cell_size + self.cell_size), 2)
-        
+                self.draw_cell(x, y)
+        self.screen.fill(WHITE)
+        self.screen.blit(self.board_surface, (0, 0))
+        self.last_info = None
+
+    def draw_cell(self, x, y):
+        surface = self.board_surface
+        rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
+        if self.revealed[y][x]:
+            if self.grid[y][x] == -1:
+                pygame.draw.rect(surface, RED, rect)
+            else:
+                pygame.draw.rect(surface, GRAY, rect)
+                if self.grid[y][x] > 0:
+                    surface.blit(self.glyphs[self.grid[y][x]], (x * self.cell_size + self.cell_size // 3, y * self.cell_size))
+        else:
+            pygame.draw.rect(surface, WHITE, rect)
+            pygame.draw.rect(surface, BLACK, rect, 1)
+            if self.flagged[y][x]:
+                pygame.draw.line(surface, BLACK, (x * self.cell_size, y * self.cell_size),
+                                 (x * self.cell_size + self.cell_size, y * self.cell_size + self.cell_size), 2)
+                pygame.draw.line(surface, BLACK, (x * self.cell_size + self.cell_size, y * self.cell_size),
+                                 (x * self.cell_size, y * self.cell_size + self.cell_size), 2)
+        return rect
+
+    def draw(self):
+        # Only cells changed since the last frame are repainted, and nothing
+        # is pushed to the display when the board and the info line are idle
+        dirty = []
+        for x, y in self.changed:
+            rect = self.draw_cell(x, y)
+            self.screen.blit(self.board_surface, rect, rect)
+            dirty.append(rect)
+        self.changed.clear()
+
         # Draw info
         elapsed_time = int(time.time() - self.start_time) if self.start_time else 0
-        time_text = self.font.render(f"Tempo: {elapsed_time} s", True, BLACK)
-        self.screen.blit(time_text, (10, self.screen_size + 10))
-        
-        bombs_left = self.bombs - sum(sum(row) for row in self.flagged)
-        bombs_text = self.font.render(f"Bombas restantes: {bombs_left}", True, BLACK)
-        self.screen.blit(bombs_text, (10, self.screen_size + 50))
+        bombs_left = self.bombs - self.flag_count
+        if (elapsed_time, bombs_left) != self.last_info:
+            self.last_info = (elapsed_time, bombs_left)
+            info_rect = pygame.Rect(0, self.screen_size, self.screen_size, 100)
+            self.screen.fill(WHITE, info_rect)
+            time_text = self.font.render(f"Tempo: {elapsed_time} s", True, BLACK)
+            self.screen.blit(time_text, (10, self.screen_size + 10))
+            bombs_text = self.font.render(f"Bombas restantes: {bombs_left}", True, BLACK)
+            self.screen.blit(bombs_text, (10, self.screen_size + 50))
+            dirty.append(info_rect)
 
-        pygame.display.flip()
+        if dirty:
+            pygame.display.update(dirty)
 
     def run(self):
+        clock = pygame.time.Clock()
+        pygame.display.flip()
         running = True
         while running:
             for event in pygame.event.get():
@@ -129,8 +503,12 @@ class Minesweeper:
                     x, y = pygame.mouse.get_pos()
                     if y < self.screen_size:  # Click inside the grid
                         grid_x, grid_y = x // self.cell_size, y // self.cell_size
-                        if event.button == 1:
+                        if event.button == 1 and self.revealed[grid_y][grid_x]:
+                            self.chord(grid_x, grid_y)
+                        elif event.button == 1:
                             self.reveal(grid_x, grid_y)
+                        elif event.button == 2:
+                            self.chord(grid_x, grid_y)
                         elif event.button == 3:
                             self.flag(grid_x, grid_y)
             self.draw()
@@ -140,6 +518,7 @@ class Minesweeper:
             elif self.victory:
                 self.show_end_screen("Victory!")
                 running = False
+            clock.tick(60)
 
         pygame.quit()
         sys.exit()
@@ -152,12 +531,105 @@ class Minesweeper:
         pygame.time.wait(2000)
         main_menu()
 
+class InfiniteMinesweeper(InfiniteBoard):
+    # Fixed-size window over an unbounded board: arrow keys or WASD scroll,
+    # and only the cells inside the view are drawn
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.cell_size = INFINITE['cell_size']
+        self.width = INFINITE['width']
+        self.height = INFINITE['height']
+        self.screen = pygame.display.set_mode((self.width, self.height + 100))
+        pygame.display.set_caption('Campo Minado Infinito')
+        self.font = pygame.font.SysFont(None, 36)
+        self.glyphs = number_glyphs(self.cell_size)
+        self.camera_x = -self.width // 2
+        self.camera_y = -self.height // 2
+
+    def draw_cell(self, x, y):
+        rect = pygame.Rect(x * self.cell_size - self.camera_x, y * self.cell_size - self.camera_y,
+                           self.cell_size, self.cell_size)
+        if self.is_revealed(x, y):
+            if self.is_bomb(x, y):
+                pygame.draw.rect(self.screen, RED, rect)
+            else:
+                pygame.draw.rect(self.screen, GRAY, rect)
+                number = self.number(x, y)
+                if number > 0:
+                    self.screen.blit(self.glyphs[number], (rect.x + self.cell_size // 3, rect.y))
+        else:
+            pygame.draw.rect(self.screen, WHITE, rect)
+            pygame.draw.rect(self.screen, BLACK, rect, 1)
+            if self.is_flagged(x, y):
+                pygame.draw.line(self.screen, BLACK, rect.topleft, rect.bottomright, 2)
+                pygame.draw.line(self.screen, BLACK, rect.topright, rect.bottomleft, 2)
+
+    def draw(self):
+        self.screen.set_clip(pygame.Rect(0, 0, self.width, self.height))
+        for y in range(self.camera_y // self.cell_size, (self.camera_y + self.height) // self.cell_size + 1):
+            for x in range(self.camera_x // self.cell_size, (self.camera_x + self.width) // self.cell_size + 1):
+                self.draw_cell(x, y)
+        self.screen.set_clip(None)
+        self.changed.clear()
+
+        elapsed_time = int(time.time() - self.start_time) if self.start_time else 0
+        self.screen.fill(WHITE, (0, self.height, self.width, 100))
+        info = f"Tempo: {elapsed_time} s   Abertas: {self.revealed_safe}   Chunks: {len(self.chunks)}"
+        self.screen.blit(self.font.render(info, True, BLACK), (10, self.height + 10))
+        bombs_text = self.font.render(f"Bandeiras: {self.flag_count}", True, BLACK)
+        self.screen.blit(bombs_text, (10, self.height + 50))
+        pygame.display.flip()
+
+    def run(self):
+        clock = pygame.time.Clock()
+        scroll_keys = {pygame.K_LEFT: (-1, 0), pygame.K_a: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_d: (1, 0),
+                       pygame.K_UP: (0, -1), pygame.K_w: (0, -1), pygame.K_DOWN: (0, 1), pygame.K_s: (0, 1)}
+        last_info = None
+        running = True
+        while running:
+            moved = False
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.pos[1] < self.height:
+                    grid_x = (event.pos[0] + self.camera_x) // self.cell_size
+                    grid_y = (event.pos[1] + self.camera_y) // self.cell_size
+                    if event.button == 1 and self.is_revealed(grid_x, grid_y):
+                        self.chord(grid_x, grid_y)
+                    elif event.button == 1:
+                        self.reveal(grid_x, grid_y)
+                    elif event.button == 2:
+                        self.chord(grid_x, grid_y)
+                    elif event.button == 3:
+                        self.flag(grid_x, grid_y)
+            pressed = pygame.key.get_pressed()
+            for key, (dx, dy) in scroll_keys.items():
+                if pressed[key]:
+                    self.camera_x += dx * 10
+                    self.camera_y += dy * 10
+                    moved = True
+            info = int(time.time() - self.start_time) if self.start_time else 0
+            if moved or self.changed or info != last_info:
+                last_info = info
+                self.draw()
+            if self.game_over:
+                self.screen.fill(WHITE)
+                text = self.font.render(f"Game Over - {self.revealed_safe} casas abertas", True, RED)
+                self.screen.blit(text, (self.width // 2 - text.get_width() // 2, self.height // 2))
+                pygame.display.flip()
+                pygame.time.wait(2000)
+                main_menu()
+            clock.tick(60)
+
+        pygame.quit()
+        sys.exit()
+
 def main_menu():
     screen = pygame.display.set_mode((400, 400))
     pygame.display.set_caption('Minesweeper - Menu')
     font = pygame.font.SysFont(None, 48)
-    menu_items = ["Easy", "Medium", "Hard"]
-    difficulties = ['easy', 'medium', 'hard']
+    menu_items = ["Easy", "Medium", "Hard", "Infinite"]
+    difficulties = ['easy', 'medium', 'hard', 'infinite']
     while True:
         screen.fill(WHITE)
         
@@ -168,7 +640,10 @@ def main_menu():
             if text_rect.collidepoint(pygame.mouse.get_pos()):
                 pygame.draw.rect(screen, BLUE, text_rect, 2)
                 if pygame.mouse.get_pressed()[0]:
-                    game = Minesweeper(difficulties[i])
+                    if difficulties[i] == 'infinite':
+                        game = InfiniteMinesweeper()
+                    else:
+                        game = Minesweeper(difficulties[i])
                     game.run()
         
         pygame.display.flip()
@@ -178,5 +653,76 @@ def main_menu():
                 pygame.quit()
                 sys.exit()
 
+def simulate_batch(job):
+    # Lets the AutoPlayer finish count boards, keeping per-game wall time,
+    # generation cost and the boards' action timings
+    seed, count, difficulty, safe_start, no_guess = job
+    random.seed(seed)
+    wins = no_guess_wins = 0
+    timings = []
+    generation = []
+    actions = {}
+    for _ in range(count):
+        start = time.perf_counter()
+        board = MinesweeperBoard(difficulty, safe_start=safe_start, no_guess=no_guess)
+        player = AutoPlayer(board)
+        won = player.play()
+        timings.append(time.perf_counter() - start)
+        generation.append((board.generation_time, board.generation_attempts))
+        merge_timings(actions, board.timings)
+        wins += won
+        # The opening click is always a guess
+        no_guess_wins += won and player.guesses == 1
+    return count, wins, no_guess_wins, timings, generation, actions
+
+def simulate(difficulty, games, workers, seed, safe_start=False, no_guess=False, batch_size=1000):
+    return run_jobs(simulate_batch, seeded_jobs(seed, games, batch_size, difficulty, safe_start, no_guess), workers)
+
+def simulate_command(args):
+    start = time.perf_counter()
+    played = wins = no_guess_wins = 0
+    timings = []
+    generation = []
+    actions = {}
+    batches = simulate(args.difficulty, args.games, args.workers, args.seed, args.safe_start, args.no_guess)
+    for count, batch_wins, batch_no_guess, batch_timings, batch_generation, batch_actions in batches:
+        merge_timings(actions, batch_actions)
+        played += count
+        wins += batch_wins
+        no_guess_wins += batch_no_guess
+        timings += batch_timings
+        generation += batch_generation
+    elapsed = time.perf_counter() - start
+    timings.sort()
+    print(f"{played} {args.difficulty} games in {elapsed:.2f} s ({played / elapsed:.0f} games/s)")
+    print(f"win rate: {wins / played:.2%}, solved without guessing: {no_guess_wins / played:.2%}")
+    print(f"per game: mean {sum(timings) / played * 1000:.3f} ms, "
+          f"p50 {timings[played // 2] * 1000:.3f} ms, p99 {timings[played * 99 // 100] * 1000:.3f} ms")
+    if args.safe_start or args.no_guess:
+        generation_times = sorted(t for t, _ in generation)
+        print(f"generation: mean {sum(generation_times) / played * 1000:.3f} ms, "
+              f"p99 {generation_times[played * 99 // 100] * 1000:.3f} ms, "
+              f"mean attempts {sum(a for _, a in generation) / played:.2f}, "
+              f"max attempts {max(a for _, a in generation)}")
+    print(format_timings(dict(sorted(actions.items()))))
+
+def cli(argv):
+    parser = argparse.ArgumentParser(prog="minesweeper")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sim = commands.add_parser("simulate", help="play games headlessly with the auto-player")
+    sim.add_argument("--difficulty", choices=list(DIFFICULTIES), default="easy")
+    sim.add_argument("--games", type=int, default=10000)
+    sim.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    sim.add_argument("--seed", type=int, default=random.randrange(2 ** 32))
+    sim.add_argument("--safe-start", action="store_true", help="place bombs after the first click, away from it")
+    sim.add_argument("--no-guess", action="store_true", help="only deal boards the auto-player can clear without guessing")
+    sim.set_defaults(func=simulate_command)
+    args = parser.parse_args(argv)
+    args.func(args)
+
 if __name__ == "__main__":
-    main_menu()
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        pygame.init()
+        main_menu()
@@ -1,6 +1,6 @@
 import pygame
 import random
-import os
+from scorestore import ScoreStore
 
 
 pygame.init()
@@ -24,15 +24,14 @@ BLACK = (0, 0, 0)
 FONT = pygame.font.Font(None, 74)
 
 
+SCORE_KEY = "osu"
+SCORES = ScoreStore()
+
 def load_highscore():
-    if os.path.exists('highscore.txt'):
-        with open('highscore.txt', 'r') as file:
-            return int(file.read())
-    return 0
+    return SCORES.best(SCORE_KEY)
 
-def save_highscore(score):
-    with open('highscore.txt', 'w') as file:
-        file.write(str(score))
+def save_score(score):
+    SCORES.add(SCORE_KEY, score)
 
 def display_message(screen, message, color, size, position):
     font = pygame.font.Font(None, size)
@@ -147,8 +146,7 @@ def main_game():
         pygame.display.flip()
         clock.tick(60)
     
-    if score > highscore:
-        save_highscore(score)
+    save_score(score)
     
     return score, highscore
 
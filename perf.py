@@ -0,0 +1,40 @@
+import multiprocessing
+import time
+
+# Plumbing shared by the headless tools: fanning seeded batches of work out
+# over a process pool, and per-call timing stats.
+
+def seeded_jobs(seed, total, batch_size, *args):
+    # (seed, count, *args) jobs covering total items. Batch i always gets
+    # seed + i, so results do not depend on the number of workers.
+    return [(seed + start // batch_size, min(batch_size, total - start)) + args
+            for start in range(0, total, batch_size)]
+
+def run_jobs(function, jobs, workers, chunksize=1):
+    # Yields function(job) for every job: in order when run inline, in
+    # completion order across a pool
+    if workers == 1:
+        yield from map(function, jobs)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(function, jobs, chunksize)
+
+def record_timing(timings, name, start):
+    # timings maps a name to [count, total seconds, worst seconds]
+    elapsed = time.perf_counter() - start
+    stats = timings.setdefault(name, [0, 0.0, 0.0])
+    stats[0] += 1
+    stats[1] += elapsed
+    stats[2] = max(stats[2], elapsed)
+
+def merge_timings(total, timings):
+    for name, (count, elapsed, worst) in timings.items():
+        stats = total.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += count
+        stats[1] += elapsed
+        stats[2] = max(stats[2], worst)
+
+def format_timings(timings):
+    # One "name: calls, mean, worst" line per entry, in the dict's order
+    return "\n".join(f"{name}: {count} calls, mean {elapsed / count * 1e6:.1f} us, worst {worst * 1e6:.1f} us"
+                     for name, (count, elapsed, worst) in timings.items())
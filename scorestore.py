@@ -0,0 +1,192 @@
+import atexit
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# High scores shared by all the games: one append-only log of (game, score,
+# time) records. Every record carries its length and a CRC, so a write torn
+# by a crash is found and cut off on the next open. Appends reach the OS at
+# once and are fsynced in batches. Compaction rewrites the log with only the
+# scores each game keeps, which bounds the file and so the startup cost.
+
+STORE_FILE = "scores.log"
+RECORD_HEADER = struct.Struct("<HI")  # payload length, CRC-32 of the payload
+RECORD_BODY = struct.Struct("<qd")    # score, unix time; the game key follows
+
+def encode_record(game, score, when):
+    payload = RECORD_BODY.pack(score, when) + game.encode()
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def decode_records(data):
+    # Yields (end offset, game, score, time) up to the first damaged record
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if length < RECORD_BODY.size or len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        score, when = RECORD_BODY.unpack_from(payload)
+        offset = start + length
+        yield offset, payload[RECORD_BODY.size:].decode(errors="replace"), score, when
+
+class ScoreStore:
+    def __init__(self, path=STORE_FILE, keep=100, sync_every=16, sync_interval=2.0, compact_after=1000):
+        self.path = path
+        self.keep = keep
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+        # game -> [(score, time)], best first, at most keep entries
+        self.scores = {}
+        self.records = 0
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        # Compaction replaces the log, so processes coordinate on a lock
+        # file that is never replaced
+        self.lock_file = open(path + ".lock", "ab")
+        self.file = open(path, "a+b")
+        with self.locked():
+            self.load()
+            if self.needs_compaction():
+                self.compact_locked()
+        atexit.register(self.close)
+
+    @contextmanager
+    def locked(self):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        self.scores = {}
+        self.records = 0
+        self.offset = 0
+        self.catch_up()
+
+    def catch_up(self):
+        # Indexes the records past self.offset, which other processes may
+        # have appended since we last read the log
+        self.file.seek(self.offset)
+        data = self.file.read()
+        end = 0
+        for end, game, score, when in decode_records(data):
+            self.index(game, score, when)
+            self.records += 1
+        if end < len(data):
+            # The tail was torn by a crash mid-append
+            self.file.truncate(self.offset + end)
+        self.offset += end
+
+    def index(self, game, score, when):
+        scores = self.scores.setdefault(game, [])
+        if len(scores) < self.keep or score > scores[-1][0]:
+            scores.append((score, when))
+            scores.sort(key=lambda entry: -entry[0])
+            del scores[self.keep:]
+
+    def refresh(self):
+        # Call with the lock held. Another process may have compacted the log
+        # since we opened it, or appended to it since we last read it.
+        try:
+            replaced = os.stat(self.path).st_ino != os.fstat(self.file.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self.file.close()
+            self.file = open(self.path, "a+b")
+            self.load()
+        else:
+            self.catch_up()
+
+    def best(self, game):
+        with self.locked():
+            self.refresh()
+        scores = self.scores.get(game)
+        return scores[0][0] if scores else 0
+
+    def top(self, game, n=10):
+        with self.locked():
+            self.refresh()
+        return self.scores.get(game, [])[:n]
+
+    def add(self, game, score):
+        # Returns True when score beats the game's previous best, counting
+        # scores every process has added
+        when = time.time()
+        record = encode_record(game, score, when)
+        with self.locked():
+            self.refresh()
+            scores = self.scores.get(game)
+            new_best = score > (scores[0][0] if scores else 0)
+            self.file.write(record)
+            self.file.flush()
+            self.offset += len(record)
+            self.records += 1
+            self.index(game, score, when)
+            self.pending += 1
+            if new_best or self.pending >= self.sync_every or time.monotonic() - self.last_sync >= self.sync_interval:
+                self.sync()
+            if self.needs_compaction():
+                self.compact_locked()
+        return new_best
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def needs_compaction(self):
+        return self.records > sum(len(scores) for scores in self.scores.values()) + self.compact_after
+
+    def compact(self):
+        with self.locked():
+            self.refresh()
+            self.compact_locked()
+
+    def compact_locked(self):
+        # Writes the kept scores to a new file and swaps it in, so a crash
+        # leaves either the old log or the new one
+        self.load()
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as f:
+            for game, scores in self.scores.items():
+                f.write(b"".join(encode_record(game, score, when) for score, when in scores))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        try:
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            directory = None
+        if directory is not None:
+            try:
+                os.fsync(directory)
+            except OSError:
+                pass
+            os.close(directory)
+        self.file.close()
+        self.file = open(self.path, "a+b")
+        self.offset = self.file.seek(0, os.SEEK_END)
+        self.records = sum(len(scores) for scores in self.scores.values())
+        self.pending = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.sync()
+        self.file.close()
+        self.lock_file.close()
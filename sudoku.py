@@ -1,13 +1,18 @@
 import pygame
 import random
+import argparse
+import mmap
+import multiprocessing
+import struct
+import sys
+import time
+from perf import run_jobs, seeded_jobs
 
 # Config
-pygame.init()
 WIDTH, HEIGHT = 600, 700
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Sudoku")
-FONT = pygame.font.SysFont("comicsans", 40)
-SMALL_FONT = pygame.font.SysFont("comicsans", 20)
+SCREEN = None
+FONT = None
+SMALL_FONT = None
 
 # Colors
 WHITE = (255, 255, 255)
@@ -23,35 +28,39 @@ CELL_SIZE = 60
 GRID_POS = (20, 20)
 GRID_SIZE = CELL_SIZE * 9
 
-def draw_grid():
+def draw_grid(surface=None):
+    if surface is None:
+        surface = SCREEN
     for x in range(10):
         if x % 3 == 0:
-            pygame.draw.line(SCREEN, BLACK, (GRID_POS[0] + x * CELL_SIZE, GRID_POS[1]),
+            pygame.draw.line(surface, BLACK, (GRID_POS[0] + x * CELL_SIZE, GRID_POS[1]),
                              (GRID_POS[0] + x * CELL_SIZE, GRID_POS[1] + GRID_SIZE), 4)
-            pygame.draw.line(SCREEN, BLACK, (GRID_POS[0], GRID_POS[1] + x * CELL_SIZE),
+            pygame.draw.line(surface, BLACK, (GRID_POS[0], GRID_POS[1] + x * CELL_SIZE),
                              (GRID_POS[0] + GRID_SIZE, GRID_POS[1] + x * CELL_SIZE), 4)
         else:
-            pygame.draw.line(SCREEN, GRAY, (GRID_POS[0] + x * CELL_SIZE, GRID_POS[1]),
+            pygame.draw.line(surface, GRAY, (GRID_POS[0] + x * CELL_SIZE, GRID_POS[1]),
                              (GRID_POS[0] + x * CELL_SIZE, GRID_POS[1] + GRID_SIZE), 2)
-            pygame.draw.line(SCREEN, GRAY, (GRID_POS[0], GRID_POS[1] + x * CELL_SIZE),
+            pygame.draw.line(surface, GRAY, (GRID_POS[0], GRID_POS[1] + x * CELL_SIZE),
                              (GRID_POS[0] + GRID_SIZE, GRID_POS[1] + x * CELL_SIZE), 2)
 
-def draw_numbers(board, initial_board):
+def build_glyphs():
+    # Digits 1-9 pre-rendered once per colour; index 0 is unused
+    return {color: [None] + [FONT.render(str(num), True, color) for num in range(1, 10)]
+            for color in (BLACK, BLUE, RED)}
+
+def cell_color(board, initial_board, conflicts, row, col):
+    if initial_board[row][col] != 0:
+        return BLACK
+    if (row, col) in conflicts:
+        return RED
+    return BLUE
+
+def draw_numbers(board, initial_board, conflicts):
     for row in range(9):
         for col in range(9):
             if board[row][col] != 0:
-                if initial_board[row][col] != 0:
-                    color = BLACK
-                else:
-                    temp = board[row][col]
-                    board[row][col] = 0
-                    if is_valid(board, row, col, temp):
-                        color = BLUE
-                    else:
-                        color = RED
-                    board[row][col] = temp
-                text = FONT.render(str(board[row][col]), True, color)
-                SCREEN.blit(text, (GRID_POS[0] + col * CELL_SIZE + 20, GRID_POS[1] + row * CELL_SIZE + 10))
+                color = cell_color(board, initial_board, conflicts, row, col)
+                SCREEN.blit(GLYPHS[color][board[row][col]], (GRID_POS[0] + col * CELL_SIZE + 20, GRID_POS[1] + row * CELL_SIZE + 10))
 
 def is_valid(board, row, col, num):
     for i in range(9):
@@ -64,35 +73,391 @@ def is_valid(board, row, col, num):
                 return False
     return True
 
+# Solver tables: cells are indexed 0..80, digits are bits 1..9 of a mask
+ALL_DIGITS = 0x3FE
+CELL_ROW = [i // 9 for i in range(81)]
+CELL_COL = [i % 9 for i in range(81)]
+CELL_BOX = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+UNITS = (
+    [[r * 9 + c for c in range(9)] for r in range(9)] +
+    [[r * 9 + c for r in range(9)] for c in range(9)] +
+    [[(b // 3 * 3 + i // 3) * 9 + b % 3 * 3 + i % 3 for i in range(9)] for b in range(9)]
+)
+PEER_CELLS = [
+    [j for j in range(81)
+     if j != i and (CELL_ROW[j] == CELL_ROW[i] or CELL_COL[j] == CELL_COL[i] or CELL_BOX[j] == CELL_BOX[i])]
+    for i in range(81)
+]
+BIT_COUNT = [bin(m).count("1") for m in range(1024)]
+BIT_DIGIT = {1 << d: d for d in range(1, 10)}
+
+class Solver:
+    def __init__(self, board):
+        self.cells = [board[r][c] for r in range(9) for c in range(9)]
+        self.rows = [0] * 9
+        self.cols = [0] * 9
+        self.boxes = [0] * 9
+        self.trail = []
+        self.consistent = True
+        for i, num in enumerate(self.cells):
+            if num:
+                bit = 1 << num
+                if (self.rows[CELL_ROW[i]] | self.cols[CELL_COL[i]] | self.boxes[CELL_BOX[i]]) & bit:
+                    self.consistent = False
+                self.rows[CELL_ROW[i]] |= bit
+                self.cols[CELL_COL[i]] |= bit
+                self.boxes[CELL_BOX[i]] |= bit
+        self.solution = None
+        self.nodes = 0
+        self.branches = 0
+
+    def candidates(self, i):
+        return ALL_DIGITS & ~(self.rows[CELL_ROW[i]] | self.cols[CELL_COL[i]] | self.boxes[CELL_BOX[i]])
+
+    def fill(self, i, num):
+        bit = 1 << num
+        self.cells[i] = num
+        self.rows[CELL_ROW[i]] |= bit
+        self.cols[CELL_COL[i]] |= bit
+        self.boxes[CELL_BOX[i]] |= bit
+
+    def clear(self, i):
+        bit = ~(1 << self.cells[i])
+        self.cells[i] = 0
+        self.rows[CELL_ROW[i]] &= bit
+        self.cols[CELL_COL[i]] &= bit
+        self.boxes[CELL_BOX[i]] &= bit
+
+    def place(self, i, num):
+        self.fill(i, num)
+        self.trail.append(i)
+
+    def undo(self, mark):
+        while len(self.trail) > mark:
+            self.clear(self.trail.pop())
+
+    def propagate(self):
+        # Naked and hidden singles until nothing changes; False on contradiction
+        cells = self.cells
+        changed = True
+        while changed:
+            changed = False
+            for i in range(81):
+                if cells[i] == 0:
+                    mask = self.candidates(i)
+                    if mask == 0:
+                        return False
+                    if mask & (mask - 1) == 0:
+                        self.place(i, BIT_DIGIT[mask])
+                        changed = True
+            for unit in UNITS:
+                once = twice = placed = 0
+                for i in unit:
+                    if cells[i]:
+                        placed |= 1 << cells[i]
+                    else:
+                        mask = self.candidates(i)
+                        twice |= once & mask
+                        once |= mask
+                if (once | placed) != ALL_DIGITS:
+                    return False
+                singles = once & ~twice & ~placed
+                while singles:
+                    bit = singles & -singles
+                    singles ^= bit
+                    for i in unit:
+                        if cells[i] == 0 and self.candidates(i) & bit:
+                            self.place(i, BIT_DIGIT[bit])
+                            changed = True
+                            break
+                    else:
+                        return False
+        return True
+
+    def search(self, limit=1):
+        # Returns the number of solutions found, stopping at limit
+        self.nodes += 1
+        mark = len(self.trail)
+        if not self.propagate():
+            self.undo(mark)
+            return 0
+        best, best_mask, best_count = -1, 0, 10
+        for i in range(81):
+            if self.cells[i] == 0:
+                mask = self.candidates(i)
+                if BIT_COUNT[mask] < best_count:
+                    best, best_mask, best_count = i, mask, BIT_COUNT[mask]
+                    if best_count == 2:
+                        break
+        if best == -1:
+            if self.solution is None:
+                self.solution = self.cells[:]
+            self.undo(mark)
+            return 1
+        self.branches += 1
+        found = 0
+        while best_mask and found < limit:
+            bit = best_mask & -best_mask
+            best_mask ^= bit
+            inner = len(self.trail)
+            self.place(best, BIT_DIGIT[bit])
+            found += self.search(limit - found)
+            self.undo(inner)
+        self.undo(mark)
+        return found
+
+    def has_other_solution(self, i, num):
+        # Whether the empty cell i can hold anything but num in some solution
+        others = self.candidates(i) & ~(1 << num)
+        while others:
+            bit = others & -others
+            others ^= bit
+            mark = len(self.trail)
+            self.place(i, BIT_DIGIT[bit])
+            found = self.search()
+            self.undo(mark)
+            if found:
+                return True
+        return False
+
+def count_solutions(board, limit=2):
+    solver = Solver(board)
+    if not solver.consistent:
+        return 0
+    return solver.search(limit)
+
 def solve_board(board):
+    solver = Solver(board)
+    if not solver.consistent or solver.search() == 0:
+        return False
+    for i, num in enumerate(solver.solution):
+        board[CELL_ROW[i]][CELL_COL[i]] = num
+    return True
+
+def solve_board_backtracking(board):
     for row in range(9):
         for col in range(9):
             if board[row][col] == 0:
                 for num in range(1, 10):
                     if is_valid(board, row, col, num):
                         board[row][col] = num
-                        if solve_board(board):
+                        if solve_board_backtracking(board):
                             return True
                         board[row][col] = 0
                 return False
     return True
 
-def generate_full_board():
-    board = [[0] * 9 for _ in range(9)]
-    
-    for _ in range(7):  
-        row, col = random.randint(0, 8), random.randint(0, 8)
-        num = random.randint(1, 9)
-        if is_valid(board, row, col, num):  
-            board[row][col] = num
-    
-    temp_board = [row[:] for row in board]
-    if solve_board(temp_board):
-        return temp_board
-    else:
-        return generate_full_board()
+# Grading: solve the way a person would, with the cheapest technique that
+# makes progress, and fall back to search only when the ladder is exhausted
+GRADES = ["easy", "medium", "hard", "expert"]
+
+class Grader:
+    def __init__(self, board):
+        self.cells = [board[r][c] for r in range(9) for c in range(9)]
+        self.cands = [0] * 81
+        for i in range(81):
+            if self.cells[i] == 0:
+                used = 0
+                for j in PEER_CELLS[i]:
+                    used |= 1 << self.cells[j]
+                self.cands[i] = ALL_DIGITS & ~used
+        self.ladder = [
+            ("naked_single", self.naked_single),
+            ("hidden_single", self.hidden_single),
+            ("naked_pair", self.naked_pair),
+            ("pointing", self.pointing),
+            ("x_wing", self.x_wing),
+        ]
+        self.techniques = {name: 0 for name, _ in self.ladder}
+        self.cost = 0
+
+    def assign(self, i, num):
+        bit = ~(1 << num)
+        self.cells[i] = num
+        self.cands[i] = 0
+        for j in PEER_CELLS[i]:
+            self.cands[j] &= bit
+
+    def eliminate(self, cells, mask):
+        changed = False
+        for i in cells:
+            if self.cands[i] & mask:
+                self.cands[i] &= ~mask
+                changed = True
+        return changed
+
+    def naked_single(self):
+        for i in range(81):
+            mask = self.cands[i]
+            if mask and mask & (mask - 1) == 0:
+                self.assign(i, BIT_DIGIT[mask])
+                return True
+        return False
+
+    def hidden_single(self):
+        for unit in UNITS:
+            once = twice = 0
+            for i in unit:
+                twice |= once & self.cands[i]
+                once |= self.cands[i]
+            singles = once & ~twice
+            if singles:
+                bit = singles & -singles
+                for i in unit:
+                    if self.cands[i] & bit:
+                        self.assign(i, BIT_DIGIT[bit])
+                        return True
+        return False
+
+    def naked_pair(self):
+        for unit in UNITS:
+            pairs = [i for i in unit if BIT_COUNT[self.cands[i]] == 2]
+            for a in range(len(pairs)):
+                for b in range(a + 1, len(pairs)):
+                    mask = self.cands[pairs[a]]
+                    if self.cands[pairs[b]] == mask:
+                        others = [i for i in unit if i != pairs[a] and i != pairs[b]]
+                        if self.eliminate(others, mask):
+                            return True
+        return False
+
+    def pointing(self):
+        # A digit confined to one row or column of a box is removed from the
+        # rest of that row or column
+        for box in UNITS[18:]:
+            for num in range(1, 10):
+                bit = 1 << num
+                spots = [i for i in box if self.cands[i] & bit]
+                if len(spots) < 2:
+                    continue
+                if all(CELL_ROW[i] == CELL_ROW[spots[0]] for i in spots):
+                    line = UNITS[CELL_ROW[spots[0]]]
+                elif all(CELL_COL[i] == CELL_COL[spots[0]] for i in spots):
+                    line = UNITS[9 + CELL_COL[spots[0]]]
+                else:
+                    continue
+                if self.eliminate([i for i in line if i not in box], bit):
+                    return True
+        return False
+
+    def x_wing(self):
+        for lines, cross, position in ((UNITS[:9], UNITS[9:18], CELL_COL), (UNITS[9:18], UNITS[:9], CELL_ROW)):
+            for num in range(1, 10):
+                bit = 1 << num
+                seen = {}
+                for line in lines:
+                    spots = [i for i in line if self.cands[i] & bit]
+                    if len(spots) != 2:
+                        continue
+                    key = (position[spots[0]], position[spots[1]])
+                    if key in seen:
+                        corners = set(spots) | set(seen[key])
+                        others = [i for k in key for i in cross[k] if i not in corners]
+                        if self.eliminate(others, bit):
+                            return True
+                    else:
+                        seen[key] = spots
+        return False
+
+    def grade(self):
+        while 0 in self.cells:
+            for name, technique in self.ladder:
+                self.cost += 1
+                if technique():
+                    self.techniques[name] += 1
+                    break
+            else:
+                break
+        branches = 0
+        if 0 in self.cells:
+            solver = Solver([self.cells[r * 9:r * 9 + 9] for r in range(9)])
+            solver.search()
+            branches = solver.branches
+            self.cost += solver.nodes
+        if branches:
+            grade = "expert"
+        elif self.techniques["x_wing"]:
+            grade = "hard"
+        elif self.techniques["naked_pair"] or self.techniques["pointing"]:
+            grade = "medium"
+        else:
+            grade = "easy"
+        return {"grade": grade, "techniques": dict(self.techniques), "branches": branches, "cost": self.cost}
+
+def grade_board(board):
+    return Grader(board).grade()
+
+def generate_graded_board(grade, max_attempts=20):
+    # Strip a grid down to a minimal unique puzzle, then give clues back one
+    # at a time. A clue that would make the puzzle easier than the target is
+    # taken back out and the next one tried. Returns the candidate closest to
+    # the grade over all attempts; stats counts the grading work.
+    target = GRADES.index(grade)
+    stats = {"attempts": 0, "gradings": 0, "grading_cost": 0, "grading_time": 0.0}
+
+    def timed_grade(puzzle):
+        start = time.perf_counter()
+        report = grade_board(puzzle)
+        stats["grading_time"] += time.perf_counter() - start
+        stats["gradings"] += 1
+        stats["grading_cost"] += report["cost"]
+        return report
+
+    best = None
+    for _ in range(max_attempts):
+        stats["attempts"] += 1
+        solution = generate_full_board()
+        puzzle = [row[:] for row in solution]
+        remove_numbers_unique(puzzle, 81)
+        report = timed_grade(puzzle)
+        hints = [(r, c) for r in range(9) for c in range(9) if puzzle[r][c] == 0]
+        random.shuffle(hints)
+        while GRADES.index(report["grade"]) > target and hints:
+            r, c = hints.pop()
+            puzzle[r][c] = solution[r][c]
+            candidate = timed_grade(puzzle)
+            if GRADES.index(candidate["grade"]) < target:
+                puzzle[r][c] = 0
+            else:
+                report = candidate
+        distance = abs(GRADES.index(report["grade"]) - target)
+        if best is None or distance < best[0]:
+            best = (distance, [row[:] for row in puzzle], report)
+        if distance == 0:
+            break
+    return best[1], best[2], stats
+
+def shuffled_groups():
+    # Random order of 0..8 that keeps each group of three together
+    groups = random.sample(range(3), 3)
+    return [g * 3 + i for g in groups for i in random.sample(range(3), 3)]
+
+def generate_full_board(method="permute"):
+    if method == "search":
+        return generate_full_board_search()
+    # Every transform below maps a valid grid to a valid grid
+    digits = random.sample(range(1, 10), 9)
+    rows = shuffled_groups()
+    cols = shuffled_groups()
+    board = [[digits[(r * 3 + r // 3 + c) % 9] for c in cols] for r in rows]
+    if random.random() < 0.5:
+        board = [list(col) for col in zip(*board)]
+    return board
+
+def generate_full_board_search():
+    while True:
+        board = [[0] * 9 for _ in range(9)]
+
+        for _ in range(7):
+            row, col = random.randint(0, 8), random.randint(0, 8)
+            num = random.randint(1, 9)
+            if is_valid(board, row, col, num):
+                board[row][col] = num
 
-def remove_numbers(board, difficulty):
+        if solve_board(board):
+            return board
+
+def remove_numbers(board, difficulty, unique=False):
     removal_count = 0
     if difficulty == "easy":
         removal_count = 30
@@ -100,7 +465,11 @@ def remove_numbers(board, difficulty):
         removal_count = 40
     elif difficulty == "hard":
         removal_count = 50
-    
+
+    if unique:
+        remove_numbers_unique(board, removal_count)
+        return
+
     removed_positions = set()
     while removal_count > 0:
         row, col = random.randint(0, 8), random.randint(0, 8)
@@ -109,41 +478,119 @@ def remove_numbers(board, difficulty):
             board[row][col] = 0
             removal_count -= 1
 
-def generate_board(difficulty="easy"):
+def remove_numbers_unique(board, removal_count):
+    # One solver is kept across removals; a clue is only dropped if no other
+    # digit fits its cell, so the puzzle keeps exactly one solution
+    solver = Solver(board)
+    positions = list(range(81))
+    random.shuffle(positions)
+    for i in positions:
+        if removal_count == 0:
+            break
+        num = solver.cells[i]
+        solver.clear(i)
+        if solver.has_other_solution(i, num):
+            solver.fill(i, num)
+        else:
+            board[CELL_ROW[i]][CELL_COL[i]] = 0
+            removal_count -= 1
+
+def generate_board(difficulty="easy", unique=False):
     board = generate_full_board()
-    remove_numbers(board, difficulty)
+    remove_numbers(board, difficulty, unique)
     return board
 
+PEERS = [[(CELL_ROW[j], CELL_COL[j]) for j in peers] for peers in PEER_CELLS]
+
+class BoardModel:
+    # Per-digit occurrence counters for every row, column and box, so a key
+    # press only has to re-check the changed cell and its 20 peers
+    def __init__(self, initial_board):
+        self.initial_board = initial_board
+        self.board = [row[:] for row in initial_board]
+        self.recount()
+
+    def recount(self):
+        self.row_counts = [[0] * 10 for _ in range(9)]
+        self.col_counts = [[0] * 10 for _ in range(9)]
+        self.box_counts = [[0] * 10 for _ in range(9)]
+        self.conflicts = set()
+        for row in range(9):
+            for col in range(9):
+                self.count(row, col, self.board[row][col], 1)
+        for row in range(9):
+            for col in range(9):
+                self.update_conflict(row, col)
+
+    def count(self, row, col, num, delta):
+        if num:
+            self.row_counts[row][num] += delta
+            self.col_counts[col][num] += delta
+            self.box_counts[row // 3 * 3 + col // 3][num] += delta
+
+    def update_conflict(self, row, col):
+        num = self.board[row][col]
+        if num and self.initial_board[row][col] == 0 and (
+            self.row_counts[row][num] > 1 or self.col_counts[col][num] > 1 or
+            self.box_counts[row // 3 * 3 + col // 3][num] > 1
+        ):
+            self.conflicts.add((row, col))
+        else:
+            self.conflicts.discard((row, col))
+
+    def set(self, row, col, num):
+        old = self.board[row][col]
+        if old == num:
+            return
+        self.count(row, col, old, -1)
+        self.board[row][col] = num
+        self.count(row, col, num, 1)
+        self.update_conflict(row, col)
+        for peer_row, peer_col in PEERS[row * 9 + col]:
+            if self.board[peer_row][peer_col] in (old, num):
+                self.update_conflict(peer_row, peer_col)
+
+    def solve(self):
+        if solve_board(self.board):
+            self.recount()
+
+PACK = None
+
 def reset_board(difficulty):
-    global initial_board, board
-    initial_board = generate_board(difficulty)
-    board = [row[:] for row in initial_board]
+    global initial_board, model
+    if PACK is not None and PACK.count(difficulty):
+        initial_board = PACK.random_board(difficulty)[0]
+    else:
+        initial_board = generate_board(difficulty, unique=True)
+    model = BoardModel(initial_board)
 
-def draw_buttons():
+def draw_buttons(surface=None):
+    if surface is None:
+        surface = SCREEN
     solve_text = SMALL_FONT.render("Solve", True, BLACK)
     solve_rect = pygame.Rect(500, 620, 100, 50)
-    pygame.draw.rect(SCREEN, GREEN, solve_rect)
-    SCREEN.blit(solve_text, (solve_rect.x + 20, solve_rect.y + 15))
+    pygame.draw.rect(surface, GREEN, solve_rect)
+    surface.blit(solve_text, (solve_rect.x + 20, solve_rect.y + 15))
 
     reset_text = SMALL_FONT.render("Reset", True, BLACK)
     reset_rect = pygame.Rect(380, 620, 100, 50)
-    pygame.draw.rect(SCREEN, RED, reset_rect)
-    SCREEN.blit(reset_text, (reset_rect.x + 20, reset_rect.y + 15))
+    pygame.draw.rect(surface, RED, reset_rect)
+    surface.blit(reset_text, (reset_rect.x + 20, reset_rect.y + 15))
 
     easy_text = SMALL_FONT.render("Easy", True, BLACK)
     easy_rect = pygame.Rect(20, 620, 100, 50)
-    pygame.draw.rect(SCREEN, GRAY, easy_rect)
-    SCREEN.blit(easy_text, (easy_rect.x + 20, easy_rect.y + 15))
+    pygame.draw.rect(surface, GRAY, easy_rect)
+    surface.blit(easy_text, (easy_rect.x + 20, easy_rect.y + 15))
 
     medium_text = SMALL_FONT.render("Medium", True, BLACK)
     medium_rect = pygame.Rect(140, 620, 100, 50)
-    pygame.draw.rect(SCREEN, GRAY, medium_rect)
-    SCREEN.blit(medium_text, (medium_rect.x + 20, medium_rect.y + 15))
+    pygame.draw.rect(surface, GRAY, medium_rect)
+    surface.blit(medium_text, (medium_rect.x + 20, medium_rect.y + 15))
 
     hard_text = SMALL_FONT.render("Hard", True, BLACK)
     hard_rect = pygame.Rect(260, 620, 100, 50)
-    pygame.draw.rect(SCREEN, GRAY, hard_rect)
-    SCREEN.blit(hard_text, (hard_rect.x + 20, hard_rect.y + 15))
+    pygame.draw.rect(surface, GRAY, hard_rect)
+    surface.blit(hard_text, (hard_rect.x + 20, hard_rect.y + 15))
 
     return solve_rect, reset_rect, easy_rect, medium_rect, hard_rect
 
@@ -152,40 +599,95 @@ def highlight_cell(cell):
         row, col = cell
         pygame.draw.rect(SCREEN, HIGHLIGHT, (GRID_POS[0] + col * CELL_SIZE, GRID_POS[1] + row * CELL_SIZE, CELL_SIZE, CELL_SIZE), 3)
 
+def build_background():
+    # Grid and buttons never change, so they are drawn once and blitted back
+    background = pygame.Surface((WIDTH, HEIGHT))
+    background.fill(WHITE)
+    draw_grid(background)
+    buttons = draw_buttons(background)
+    return background, buttons
+
+def draw_screen(selected_cell):
+    SCREEN.blit(BACKGROUND, (0, 0))
+    highlight_cell(selected_cell)
+    draw_numbers(model.board, initial_board, model.conflicts)
+
+def draw_cell(cell, selected_cell):
+    row, col = cell
+    rect = pygame.Rect(GRID_POS[0] + col * CELL_SIZE, GRID_POS[1] + row * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+    SCREEN.set_clip(rect)
+    SCREEN.blit(BACKGROUND, rect, rect)
+    if cell == selected_cell:
+        highlight_cell(cell)
+    num = model.board[row][col]
+    if num:
+        color = cell_color(model.board, initial_board, model.conflicts, row, col)
+        SCREEN.blit(GLYPHS[color][num], (rect.x + 20, rect.y + 10))
+    SCREEN.set_clip(None)
+    return rect
+
+def init_display():
+    # Kept out of import time so the generator can run headless
+    global SCREEN, FONT, SMALL_FONT
+    pygame.init()
+    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Sudoku")
+    FONT = pygame.font.SysFont("comicsans", 40)
+    SMALL_FONT = pygame.font.SysFont("comicsans", 20)
+
 def main():
-    global initial_board, board
-    initial_board = generate_board("easy")
-    board = [row[:] for row in initial_board]
+    global model, BACKGROUND, GLYPHS
+    init_display()
+    reset_board("easy")
+    BACKGROUND, buttons = build_background()
+    GLYPHS = build_glyphs()
+    solve_button, reset_button, easy_button, medium_button, hard_button = buttons
+    clock = pygame.time.Clock()
 
     selected_cell = None
+    redraw_all = True
+    dirty = set()
     running = True
     while running:
-        SCREEN.fill(WHITE)
-        draw_grid()
-        highlight_cell(selected_cell)
-        draw_numbers(board, initial_board)
-        solve_button, reset_button, easy_button, medium_button, hard_button = draw_buttons()
-        
-        for event in pygame.event.get():
+        if redraw_all:
+            draw_screen(selected_cell)
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update([draw_cell(cell, selected_cell) for cell in dirty])
+        redraw_all = False
+        dirty = set()
+        clock.tick(60)
+
+        # The board only changes on input, so sleep in event.wait between
+        # keystrokes rather than spinning through frames
+        for event in [pygame.event.wait()] + pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
             if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = event.pos
                 if solve_button.collidepoint(mouse_pos):
-                    solve_board(board)
+                    model.solve()
+                    redraw_all = True
                 elif reset_button.collidepoint(mouse_pos):
-                    board = [row[:] for row in initial_board]
+                    model = BoardModel(initial_board)
+                    redraw_all = True
                 elif easy_button.collidepoint(mouse_pos):
                     reset_board("easy")
+                    redraw_all = True
                 elif medium_button.collidepoint(mouse_pos):
                     reset_board("medium")
+                    redraw_all = True
                 elif hard_button.collidepoint(mouse_pos):
                     reset_board("hard")
+                    redraw_all = True
                 else:
                     x, y = mouse_pos
                     if GRID_POS[0] <= x < GRID_POS[0] + GRID_SIZE and GRID_POS[1] <= y < GRID_POS[1] + GRID_SIZE:
+                        if selected_cell:
+                            dirty.add(selected_cell)
                         selected_cell = ((y - GRID_POS[1]) // CELL_SIZE, (x - GRID_POS[0]) // CELL_SIZE)
+                        dirty.add(selected_cell)
 
             if event.type == pygame.KEYDOWN and selected_cell:
                 row, col = selected_cell
@@ -214,15 +716,172 @@ def main():
                         num = None
 
                     if num is not None:
-                        if is_valid(board, row, col, num):
-                            board[row][col] = num
-                        else:
-                            board[row][col] = num  
-
-        
-        pygame.display.flip()
-    
+                        conflicts = set(model.conflicts)
+                        model.set(row, col, num)
+                        dirty.add(selected_cell)
+                        dirty |= conflicts ^ model.conflicts
+
     pygame.quit()
 
-if __name__ == "__main__":
+def board_to_string(board):
+    return "".join(str(num) for row in board for num in row)
+
+GRADE_RETRIES = 50
+
+def generate_batch(job):
+    # Builds count puzzles as (puzzle, solution) strings. Graded runs also
+    # return the summed grading stats and how many candidates missed the grade.
+    seed, count, difficulty, grade = job
+    random.seed(seed)
+    batch = []
+    totals = {"attempts": 0, "gradings": 0, "grading_cost": 0, "grading_time": 0.0, "misses": 0}
+    for _ in range(count):
+        if grade:
+            for _ in range(GRADE_RETRIES):
+                puzzle, report, stats = generate_graded_board(grade)
+                for key, value in stats.items():
+                    totals[key] += value
+                if report["grade"] == grade:
+                    break
+                totals["misses"] += 1
+            else:
+                raise RuntimeError(f"no {grade} puzzle after {GRADE_RETRIES} tries of generate_graded_board")
+            solution = [row[:] for row in puzzle]
+            solve_board(solution)
+        else:
+            solution = generate_full_board()
+            puzzle = [row[:] for row in solution]
+            remove_numbers(puzzle, difficulty, unique=True)
+        batch.append((board_to_string(puzzle), board_to_string(solution)))
+    return batch, totals
+
+def generate_puzzles(difficulty, count, workers, seed, batch_size=500, grade=None):
+    return run_jobs(generate_batch, seeded_jobs(seed, count, batch_size, difficulty, grade), workers)
+
+# Puzzle packs: a header followed by fixed-size records, grouped by difficulty.
+# Each record is the puzzle then the solution, 81 cells at 4 bits each.
+PACK_MAGIC = b"SDKP"
+PACK_VERSION = 1
+PACK_DIFFICULTIES = ["easy", "medium", "hard"]
+PACK_HEADER = struct.Struct("<4sHH" + "II" * len(PACK_DIFFICULTIES))
+PACKED_BOARD_SIZE = 41
+PACK_RECORD_SIZE = PACKED_BOARD_SIZE * 2
+NIBBLES = [(b >> 4, b & 15) for b in range(256)]
+
+def pack_board(cells):
+    digits = [int(num) for num in cells] + [0]
+    return bytes(digits[i] << 4 | digits[i + 1] for i in range(0, 82, 2))
+
+def unpack_board(data):
+    cells = [num for b in data for num in NIBBLES[b]]
+    return [cells[r * 9:r * 9 + 9] for r in range(9)]
+
+def write_pack(path, batches_by_difficulty):
+    # batches_by_difficulty maps a difficulty to an iterable of batches of
+    # (puzzle, solution) strings; records are streamed and the header is
+    # patched with the final counts at the end
+    index = []
+    total = 0
+    with open(path, "wb") as f:
+        f.write(bytes(PACK_HEADER.size))
+        for difficulty in PACK_DIFFICULTIES:
+            start = total
+            for batch in batches_by_difficulty.get(difficulty, ()):
+                f.write(b"".join(pack_board(puzzle) + pack_board(solution) for puzzle, solution in batch))
+                total += len(batch)
+            index += [start, total - start]
+        f.seek(0)
+        f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, PACK_RECORD_SIZE, *index))
+    return total
+
+class PuzzlePack:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, *index = PACK_HEADER.unpack_from(self.data)
+        if magic != PACK_MAGIC or version != PACK_VERSION or record_size != PACK_RECORD_SIZE:
+            raise ValueError(f"{path} is not a sudoku puzzle pack")
+        self.index = {difficulty: (index[i * 2], index[i * 2 + 1]) for i, difficulty in enumerate(PACK_DIFFICULTIES)}
+
+    def __len__(self):
+        return sum(count for _, count in self.index.values())
+
+    def count(self, difficulty):
+        return self.index[difficulty][1]
+
+    def read(self, n):
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+        offset = PACK_HEADER.size + n * PACK_RECORD_SIZE
+        return (unpack_board(self.data[offset:offset + PACKED_BOARD_SIZE]),
+                unpack_board(self.data[offset + PACKED_BOARD_SIZE:offset + PACK_RECORD_SIZE]))
+
+    def random_board(self, difficulty):
+        start, count = self.index[difficulty]
+        return self.read(start + random.randrange(count))
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+def generate_command(args):
+    start = time.perf_counter()
+    written = 0
+    totals = {}
+    with open(args.output, "w") as f:
+        for batch, stats in generate_puzzles(args.difficulty, args.count, args.workers, args.seed, grade=args.grade):
+            f.write("\n".join(puzzle for puzzle, _ in batch) + "\n")
+            written += len(batch)
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+    elapsed = time.perf_counter() - start
+    print(f"{written} {args.grade or args.difficulty} puzzles in {elapsed:.2f} s ({written / elapsed:.0f}/s) -> {args.output}",
+          file=sys.stderr)
+    if args.grade and written:
+        print(f"grading: mean cost {totals['grading_cost'] / written:.1f}, "
+              f"{totals['grading_time'] / written * 1000:.2f} ms and {totals['gradings'] / written:.1f} gradings per puzzle; "
+              f"{totals['misses']} candidates missed the grade and were regenerated", file=sys.stderr)
+
+def pack_command(args):
+    start = time.perf_counter()
+    batches = {difficulty: (batch for batch, _ in generate_puzzles(difficulty, args.count, args.workers, args.seed + i * args.count))
+               for i, difficulty in enumerate(args.difficulty)}
+    written = write_pack(args.output, batches)
+    elapsed = time.perf_counter() - start
+    print(f"{written} puzzles in {elapsed:.2f} s ({written / elapsed:.0f}/s) -> {args.output}", file=sys.stderr)
+
+def play_command(args):
+    global PACK
+    if args.pack:
+        PACK = PuzzlePack(args.pack)
     main()
+
+def cli(argv):
+    parser = argparse.ArgumentParser(prog="sudoku")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="generate unique puzzles headlessly")
+    generate.add_argument("--difficulty", choices=PACK_DIFFICULTIES, default="easy")
+    generate.add_argument("--grade", choices=GRADES, help="target a technique grade instead of a clue count")
+    generate.add_argument("--count", type=int, default=1000)
+    generate.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    generate.add_argument("--seed", type=int, default=random.randrange(2 ** 32))
+    generate.add_argument("--output", default="puzzles.txt")
+    generate.set_defaults(func=generate_command)
+    pack = commands.add_parser("pack", help="generate a binary puzzle pack")
+    pack.add_argument("--difficulty", choices=PACK_DIFFICULTIES, nargs="+", default=PACK_DIFFICULTIES)
+    pack.add_argument("--count", type=int, default=1000, help="puzzles per difficulty")
+    pack.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    pack.add_argument("--seed", type=int, default=random.randrange(2 ** 32))
+    pack.add_argument("--output", default="puzzles.pack")
+    pack.set_defaults(func=pack_command)
+    play = commands.add_parser("play", help="open the game window")
+    play.add_argument("--pack", help="pick puzzles from this pack instead of generating them")
+    play.set_defaults(func=play_command)
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
@@ -1,5 +1,11 @@
+import argparse
+import asyncio
 import pygame
 import sys
+import threading
+from tictactoe2_ai import TicTacToeAI
+from tictactoe2_net import Client, DEFAULT_PORT, START, MOVE, END, DRAW, ABANDONED
+from tictactoe2_rules import Player, TicTacToe, SIZES, SIZE_RANK
 
 pygame.init()
 
@@ -19,34 +25,41 @@ GREY = (200, 200, 200)
 # Font
 FONT = pygame.font.SysFont("comicsans", 40)
 SMALL_FONT = pygame.font.SysFont("comicsans", 30)
+LARGE_FONT = pygame.font.SysFont("comicsans", 80)
+
+SIDEBAR_RECT = pygame.Rect(GRID_SIZE, 0, WIDTH - GRID_SIZE, HEIGHT)
+MENU_X_BUTTON = pygame.Rect(WIDTH // 4 - 50, HEIGHT // 2 - 50, 100, 100)
+MENU_O_BUTTON = pygame.Rect(3 * WIDTH // 4 - 50, HEIGHT // 2 - 50, 100, 100)
+MENU_COMPUTER_BUTTON = pygame.Rect(WIDTH // 2 - 150, HEIGHT - 150, 300, 60)
+
+def build_glyphs():
+    # Every symbol in every size and player colour, rendered once
+    fonts = {"small": SMALL_FONT, "medium": FONT, "large": LARGE_FONT}
+    return {(symbol, color): {size: font.render(symbol, True, color) for size, font in fonts.items()}
+            for symbol in ("X", "O") for color in (RED, BLUE)}
+
+GLYPHS = build_glyphs()
+
+NET_EVENT = pygame.USEREVENT + 1
 
 def draw_grid():
     WIN.fill(WHITE)
     for x in range(1, 3):
         pygame.draw.line(WIN, BLACK, (x * GRID_SIZE // 3, 0), (x * GRID_SIZE // 3, GRID_SIZE), 3)
         pygame.draw.line(WIN, BLACK, (0, x * GRID_SIZE // 3), (GRID_SIZE, x * GRID_SIZE // 3), 3)
-    pygame.display.update()
 
 def draw_piece(row, col, size, symbol, color):
+    # Returns the cell rect for display.update
     x = col * GRID_SIZE // 3 + GRID_SIZE // 6
     y = row * GRID_SIZE // 3 + GRID_SIZE // 6
-    
-    if size == "small":
-        text = SMALL_FONT.render(symbol, True, color)
-    elif size == "medium":
-        text = FONT.render(symbol, True, color)
-    elif size == "large":
-        large_font = pygame.font.SysFont("comicsans", 80) 
-        text = large_font.render(symbol, True, color)
-        
-    text_rect = text.get_rect(center=(x, y))
-    pygame.draw.circle(WIN, WHITE, (x, y), 80)  
-    WIN.blit(text, text_rect)
-    pygame.display.update()
-
+    text = GLYPHS[symbol, color][size]
+    pygame.draw.circle(WIN, WHITE, (x, y), 80)
+    WIN.blit(text, text.get_rect(center=(x, y)))
+    return pygame.Rect(col * GRID_SIZE // 3, row * GRID_SIZE // 3, GRID_SIZE // 3, GRID_SIZE // 3)
 
 def draw_sidebar(current_player, selected_size):
-    pygame.draw.rect(WIN, GREY, (GRID_SIZE, 0, WIDTH - GRID_SIZE, HEIGHT))
+    # Returns the sidebar rect for display.update
+    pygame.draw.rect(WIN, GREY, SIDEBAR_RECT)
     turn_text = FONT.render(f"Vez de {current_player.symbol}", True, current_player.color)
     WIN.blit(turn_text, (GRID_SIZE + 20, 20))
 
@@ -59,63 +72,14 @@ def draw_sidebar(current_player, selected_size):
             pygame.draw.rect(WIN, BLACK, (GRID_SIZE + 10, y_start - 10, 200, 60), 3)
         y_start += 80
 
-    pygame.display.update()
+    return SIDEBAR_RECT
 
-class Player:
-    def __init__(self, symbol, color):
-        self.symbol = symbol
-        self.color = color
-        self.pieces = {"small": 3, "medium": 3, "large": 3}
-
-class TicTacToe:
-    size_order = {"small": 1, "medium": 2, "large": 3}
-
-    def __init__(self):
-        self.board = [[None for _ in range(3)] for _ in range(3)]
-        self.current_turn = None
-        self.players = []
-
-    def add_player(self, player):
-        self.players.append(player)
-        if len(self.players) == 1:
-            self.current_turn = player
-
-    def switch_turn(self):
-        self.current_turn = self.players[1] if self.current_turn == self.players[0] else self.players[0]
-
-    def make_move(self, row, col, size):
-        if self.board[row][col] is None or TicTacToe.size_order[self.board[row][col][1]] < TicTacToe.size_order[size]:
-            self.board[row][col] = (self.current_turn.symbol, size)
-            self.current_turn.pieces[size] -= 1
-            draw_piece(row, col, size, self.current_turn.symbol, self.current_turn.color)
-            return True
-        return False
-
-    def check_winner(self):
-        lines = [
-            [self.board[r][c] for c in range(3)] for r in range(3)
-        ] + [
-            [self.board[r][c] for r in range(3)] for c in range(3)
-        ] + [
-            [self.board[i][i] for i in range(3)],
-            [self.board[i][2 - i] for i in range(3)]
-        ]
-        for line in lines:
-            if all(cell is not None and cell[0] == line[0][0] for cell in line):
-                return self.current_turn
-        return None
-
-    def is_full(self):
-        return all(all(cell is not None for cell in row) for row in self.board)
-
-    def has_possible_moves(self):
-        for row in range(3):
-            for col in range(3):
-                for size in ["small", "medium", "large"]:
-                    if self.board[row][col] is None or TicTacToe.size_order[self.board[row][col][1]] < TicTacToe.size_order[size]:
-                        if self.current_turn.pieces[size] > 0:
-                            return True
-        return False
+def size_at(y):
+    # The size whose sidebar row draw_sidebar put at height y, if any
+    for i, size in enumerate(SIZES):
+        if 100 + i * 80 <= y <= 160 + i * 80:
+            return size
+    return None
 
 def display_end_message(message):
     WIN.fill(WHITE)
@@ -124,95 +88,224 @@ def display_end_message(message):
     pygame.display.update()
     waiting = True
     while waiting:
-        for event in pygame.event.get():
+        for event in [pygame.event.wait()] + pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 waiting = False
 
+def draw_menu(vs_computer):
+    WIN.fill(WHITE)
+    title = FONT.render("Choose your fighter", True, BLACK)
+    WIN.blit(title, (WIDTH // 2 - title.get_width() // 2, 50))
+
+    x_button, o_button = MENU_X_BUTTON, MENU_O_BUTTON
+    pygame.draw.rect(WIN, RED, x_button)
+    pygame.draw.rect(WIN, BLUE, o_button)
+    x_text = FONT.render("X", True, WHITE)
+    o_text = FONT.render("O", True, WHITE)
+    WIN.blit(x_text, (x_button.x + x_button.width // 2 - x_text.get_width() // 2, x_button.y + x_button.height // 2 - x_text.get_height() // 2))
+    WIN.blit(o_text, (o_button.x + o_button.width // 2 - o_text.get_width() // 2, o_button.y + o_button.height // 2 - o_button.height // 2))
+
+    computer_button = MENU_COMPUTER_BUTTON
+    pygame.draw.rect(WIN, BLACK if vs_computer else GREY, computer_button)
+    computer_text = SMALL_FONT.render("vs Computer: " + ("on" if vs_computer else "off"), True, WHITE if vs_computer else BLACK)
+    WIN.blit(computer_text, (computer_button.centerx - computer_text.get_width() // 2, computer_button.centery - computer_text.get_height() // 2))
+
 def main_menu():
     run = True
     player_choice = None
+    vs_computer = False
+    redraw = True
     while run:
-        WIN.fill(WHITE)
-        title = FONT.render("Choose your fighter", True, BLACK)
-        WIN.blit(title, (WIDTH // 2 - title.get_width() // 2, 50))
-
-        x_button = pygame.Rect(WIDTH // 4 - 50, HEIGHT // 2 - 50, 100, 100)
-        o_button = pygame.Rect(3 * WIDTH // 4 - 50, HEIGHT // 2 - 50, 100, 100)
-        pygame.draw.rect(WIN, RED, x_button)
-        pygame.draw.rect(WIN, BLUE, o_button)
-        x_text = FONT.render("X", True, WHITE)
-        o_text = FONT.render("O", True, WHITE)
-        WIN.blit(x_text, (x_button.x + x_button.width // 2 - x_text.get_width() // 2, x_button.y + x_button.height // 2 - x_text.get_height() // 2))
-        WIN.blit(o_text, (o_button.x + o_button.width // 2 - o_text.get_width() // 2, o_button.y + o_button.height // 2 - o_button.height // 2))
-
-        for event in pygame.event.get():
+        if redraw:
+            draw_menu(vs_computer)
+            pygame.display.update()
+        redraw = False
+
+        for event in [pygame.event.wait()] + pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if x_button.collidepoint(event.pos):
+                if MENU_X_BUTTON.collidepoint(event.pos):
                     player_choice = ("X", RED)
                     run = False
-                elif o_button.collidepoint(event.pos):
+                elif MENU_O_BUTTON.collidepoint(event.pos):
                     player_choice = ("O", BLUE)
                     run = False
+                elif MENU_COMPUTER_BUTTON.collidepoint(event.pos):
+                    vs_computer = not vs_computer
+                    redraw = True
 
-        pygame.display.update()
+    return player_choice, vs_computer
 
-    return player_choice
+def finish_move(game, selected_size, dirty):
+    # Returns False once the game is over
+    winner = game.check_winner()
+    if winner:
+        display_end_message(f"Player {winner.symbol} wins!")
+        return False
+    game.switch_turn()
+    if not game.has_possible_moves():
+        display_end_message("Draw!")
+        return False
+    dirty.append(draw_sidebar(game.current_turn, selected_size))
+    return True
 
-def game_loop(player1, player2):
+def game_loop(player1, player2, computer=None):
     game = TicTacToe()
     game.add_player(player1)
     game.add_player(player2)
+    ai = TicTacToeAI() if computer else None
     draw_grid()
     selected_size = "small"
     draw_sidebar(game.current_turn, selected_size)
+    pygame.display.flip()
+    clock = pygame.time.Clock()
+    dirty = []
     run = True
 
     while run:
-        for event in pygame.event.get():
+        if dirty:
+            pygame.display.update(dirty)
+            dirty = []
+        clock.tick(60)
+
+        if game.current_turn is computer:
+            row, col, size = ai.best_move(game)
+            game.make_move(row, col, size)
+            dirty.append(draw_piece(row, col, size, game.current_turn.symbol, game.current_turn.color))
+            run = finish_move(game, selected_size, dirty)
+            continue
+
+        # The computer has already replied above, so nothing moves until the
+        # player clicks or presses a key: wait for that instead of polling
+        moved = False
+        for event in [pygame.event.wait()] + pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
+            if not run:
+                continue
             if event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = event.pos
                 if x < GRID_SIZE:
+                    # Board clicks queued behind a move were aimed before
+                    # the turn passed, so only the first one counts
+                    if moved:
+                        continue
                     row = y // (GRID_SIZE // 3)
                     col = x // (GRID_SIZE // 3)
                     if game.make_move(row, col, selected_size):
-                        winner = game.check_winner()
-                        if winner:
-                            display_end_message(f"Player {winner.symbol} wins!")
-                            run = False
-                        elif not game.has_possible_moves():
-                            display_end_message("Draw!")
-                            run = False
-                        else:
-                            game.switch_turn()
-                            draw_sidebar(game.current_turn, selected_size)
+                        dirty.append(draw_piece(row, col, selected_size, game.current_turn.symbol, game.current_turn.color))
+                        run = finish_move(game, selected_size, dirty)
+                        moved = True
                 else:
-                    if 100 <= y <= 160:
-                        selected_size = "small"
-                    elif 180 <= y <= 240:
-                        selected_size = "medium"
-                    elif 260 <= y <= 320:
-                        selected_size = "large"
-                    draw_sidebar(game.current_turn, selected_size)
-
-        pygame.display.update()
+                    selected_size = size_at(y) or selected_size
+                    dirty.append(draw_sidebar(game.current_turn, selected_size))
 
     main()
 
+class NetworkClient:
+    # Runs the asyncio Client on its own thread and posts every server
+    # message to the pygame queue as a NET_EVENT
+    def __init__(self, host, port):
+        self.loop = asyncio.new_event_loop()
+        self.client = None
+        threading.Thread(target=self.loop.run_until_complete, args=(self.run(host, port),), daemon=True).start()
+
+    async def run(self, host, port):
+        try:
+            self.client = await Client.connect(host, port)
+            kind = None
+            while kind != END:
+                kind, values = await self.client.receive()
+                pygame.event.post(pygame.event.Event(NET_EVENT, kind=kind, values=values))
+        except (OSError, asyncio.IncompleteReadError):
+            pygame.event.post(pygame.event.Event(NET_EVENT, kind=END, values=(ABANDONED,)))
+
+    def send_move(self, i, size):
+        self.loop.call_soon_threadsafe(self.client.send_move, i, size)
+
+def end_message(result, seat):
+    if seat is None:
+        return "Could not join a game"
+    if result == DRAW:
+        return "Draw!"
+    if result == ABANDONED:
+        return "Opponent left"
+    return "You win!" if result == seat else "You lose!"
+
+def network_loop(host, port):
+    # The server decides every move; the board only changes on its MOVE diffs
+    game = TicTacToe()
+    game.add_player(Player("X", RED))
+    game.add_player(Player("O", BLUE))
+    network = NetworkClient(host, port)
+    seat = None
+    selected_size = "small"
+    WIN.fill(WHITE)
+    waiting_text = FONT.render("Waiting for an opponent...", True, BLACK)
+    WIN.blit(waiting_text, (WIDTH // 2 - waiting_text.get_width() // 2, HEIGHT // 2 - waiting_text.get_height() // 2))
+    pygame.display.flip()
+    clock = pygame.time.Clock()
+    dirty = []
+    run = True
+
+    while run:
+        if dirty:
+            pygame.display.update(dirty)
+            dirty = []
+        clock.tick(60)
+
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            if event.type == NET_EVENT:
+                if event.kind == START:
+                    seat = event.values[0]
+                    pygame.display.set_caption(f"Tic Tac Toe 2.0 - playing {game.players[seat].symbol}")
+                    draw_grid()
+                    draw_sidebar(game.current_turn, selected_size)
+                    pygame.display.flip()
+                elif event.kind == MOVE:
+                    i, size = divmod(event.values[0], 4)
+                    game.make_move(i // 3, i % 3, SIZES[size - 1])
+                    dirty.append(draw_piece(i // 3, i % 3, SIZES[size - 1], game.current_turn.symbol, game.current_turn.color))
+                    if not game.check_winner():
+                        game.switch_turn()
+                    dirty.append(draw_sidebar(game.current_turn, selected_size))
+                elif event.kind == END:
+                    display_end_message(end_message(event.values[0], seat))
+                    run = False
+                    break
+            if event.type == pygame.MOUSEBUTTONDOWN and seat is not None:
+                x, y = event.pos
+                if x < GRID_SIZE:
+                    if game.current_turn is game.players[seat]:
+                        row = y // (GRID_SIZE // 3)
+                        col = x // (GRID_SIZE // 3)
+                        network.send_move(row * 3 + col, SIZE_RANK[selected_size])
+                else:
+                    selected_size = size_at(y) or selected_size
+                    dirty.append(draw_sidebar(game.current_turn, selected_size))
+
 def main():
-    player1_choice = main_menu()
+    player1_choice, vs_computer = main_menu()
     player2_choice = ("O", BLUE) if player1_choice[0] == "X" else ("X", RED)
     player1 = Player(*player1_choice)
     player2 = Player(*player2_choice)
-    game_loop(player1, player2)
+    game_loop(player1, player2, computer=player2 if vs_computer else None)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(prog="tictactoe2")
+    parser.add_argument("--connect", metavar="HOST[:PORT]", help="play online against a tictactoe2_net server")
+    args = parser.parse_args()
+    if args.connect:
+        host, _, port = args.connect.partition(":")
+        network_loop(host, int(port or DEFAULT_PORT))
+    else:
+        main()
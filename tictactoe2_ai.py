@@ -0,0 +1,222 @@
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from tictactoe2_rules import State, SIZES, WINNING
+
+# Computer opponent for Tic Tac Toe 2.0. Kept free of pygame so it can be
+# solved and used headlessly.
+
+WIN_SCORE = 20
+BOOK_FILE = "tictactoe2_solved.bin"
+BOOK_MAGIC = b"TTTB"
+# Bump whenever the Zobrist keys or the record layout change: books keyed by
+# old hashes would otherwise load fine and then miss on every lookup
+BOOK_VERSION = 2
+BOOK_HEADER = struct.Struct("<4sBI")  # magic, version, record count
+BOOK_RECORD = struct.Struct("<QBb")   # Zobrist key, cell * 4 + size, score
+
+# Zobrist keys with a fixed seed so hashes are stable between runs and the
+# persisted book stays valid. Cells are 0 when empty, else owner * 3 + size.
+_rng = random.Random(20240521)
+ZOBRIST_CELLS = [[0] + [_rng.getrandbits(64) for _ in range(6)] for _ in range(9)]
+ZOBRIST_PIECES = [[[_rng.getrandbits(64) for _ in range(16)] for _ in range(4)] for _ in range(2)]
+ZOBRIST_SIDE = _rng.getrandbits(64)
+
+class Position(State):
+    # State plus an incrementally updated Zobrist hash
+    def __init__(self, pieces=(3, 3, 3)):
+        super().__init__(pieces)
+        self.hash = self.zobrist()
+
+    def zobrist(self):
+        key = ZOBRIST_SIDE if self.side else 0
+        for i in range(9):
+            key ^= ZOBRIST_CELLS[i][self.cell(i)]
+        for player in range(2):
+            for size in range(1, 4):
+                key ^= ZOBRIST_PIECES[player][size][self.pieces[player][size]]
+        return key
+
+    @classmethod
+    def from_state(cls, state):
+        position = State.copy(state)
+        position.__class__ = cls
+        position.hash = position.zobrist()
+        return position
+
+    def copy(self):
+        position = super().copy()
+        position.hash = self.hash
+        return position
+
+    def play(self, i, size):
+        side = self.side
+        count = self.pieces[side][size]
+        covered = super().play(i, size)
+        self.hash ^= (ZOBRIST_CELLS[i][covered] ^ ZOBRIST_CELLS[i][side * 3 + size] ^
+                      ZOBRIST_PIECES[side][size][count] ^ ZOBRIST_PIECES[side][size][count - 1] ^ ZOBRIST_SIDE)
+        return covered
+
+    def undo(self, i, size, covered):
+        super().undo(i, size, covered)
+        side = self.side
+        count = self.pieces[side][size]
+        self.hash ^= (ZOBRIST_CELLS[i][side * 3 + size] ^ ZOBRIST_CELLS[i][covered] ^
+                      ZOBRIST_PIECES[side][size][count] ^ ZOBRIST_PIECES[side][size][count - 1] ^ ZOBRIST_SIDE)
+
+class TicTacToeAI:
+    # Negamax with alpha-beta and a transposition table keyed by the Zobrist
+    # hash. Scores are WIN_SCORE minus the distance to the win, so the AI wins
+    # as fast and loses as slowly as it can.
+    def __init__(self, book_path=BOOK_FILE):
+        self.table = {}
+        self.book = {}
+        if book_path and os.path.exists(book_path):
+            try:
+                self.book = load_book(book_path)
+            except ValueError as error:
+                # A stale book is only a missed speedup, so search instead
+                print(f"ignoring {error}; rerun tictactoe2_ai to rebuild it", file=sys.stderr)
+        self.nodes = 0
+
+    def negamax(self, position, alpha, beta):
+        self.nodes += 1
+        entry = self.table.get(position.hash)
+        if entry is not None:
+            score, flag = entry
+            if flag == 0 or (flag == 1 and score >= beta) or (flag == -1 and score <= alpha):
+                return score
+        moves = position.legal_moves()
+        if not moves:
+            return 0
+        owned = position.owners[position.side]
+        for i, size in moves:
+            if WINNING[owned | 1 << i]:
+                self.table[position.hash] = (WIN_SCORE, 0)
+                return WIN_SCORE
+        original_alpha = alpha
+        best = -WIN_SCORE - 1
+        for i, size in moves:
+            covered = position.play(i, size)
+            score = decay(-self.negamax(position, -decay_bound(beta), -decay_bound(alpha)))
+            position.undo(i, size, covered)
+            if score > best:
+                best = score
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                break
+        if best <= original_alpha:
+            flag = -1
+        elif best >= beta:
+            flag = 1
+        else:
+            flag = 0
+        self.table[position.hash] = (best, flag)
+        return best
+
+    def evaluate(self, position):
+        # Exact score and best move for the side to move
+        best_move, best = None, -WIN_SCORE - 1
+        owned = position.owners[position.side]
+        for i, size in position.legal_moves():
+            if WINNING[owned | 1 << i]:
+                score = WIN_SCORE
+            else:
+                covered = position.play(i, size)
+                score = decay(-self.negamax(position, -WIN_SCORE - 1, WIN_SCORE + 1))
+                position.undo(i, size, covered)
+            if score > best:
+                best_move, best = (i, size), score
+            if best == WIN_SCORE:
+                break
+        return best_move, best
+
+    def best_move(self, game):
+        # Returns (row, col, size name) for the player whose turn it is
+        position = Position.from_state(game.state)
+        move = self.book.get(position.hash)
+        if move is None:
+            i, size = self.evaluate(position)[0]
+        else:
+            i, size = divmod(move, 4)
+        return i // 3, i % 3, SIZES[size - 1]
+
+def decay(score):
+    # A win found one ply deeper is worth one point less
+    if score > 0:
+        return score - 1
+    if score < 0:
+        return score + 1
+    return 0
+
+def decay_bound(bound):
+    # Inverse of decay for search window bounds
+    if bound > 0:
+        return bound + 1
+    if bound < 0:
+        return bound - 1
+    return 0
+
+def solve(ai=None):
+    # Best move for every position the AI can reach from either seat, with
+    # the opponent free to play anything
+    ai = ai or TicTacToeAI(book_path=None)
+    book = {}
+    for ai_side in (0, 1):
+        visited = set()
+        stack = [Position()]
+        while stack:
+            position = stack.pop()
+            if position.hash in visited:
+                continue
+            visited.add(position.hash)
+            if position.side == ai_side:
+                move, score = ai.evaluate(position)
+                if move is None:
+                    continue
+                book[position.hash] = (move[0] * 4 + move[1], score)
+                moves = [move]
+            else:
+                moves = position.legal_moves()
+            for i, size in moves:
+                child = position.copy()
+                child.play(i, size)
+                if not child.has_won(position.side):
+                    stack.append(child)
+    return book
+
+def save_book(book, path=BOOK_FILE):
+    with open(path, "wb") as f:
+        f.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, len(book)))
+        for key, (move, score) in book.items():
+            f.write(BOOK_RECORD.pack(key, move, score))
+
+def load_book(path=BOOK_FILE):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < BOOK_HEADER.size:
+        raise ValueError(f"{path}: not a Tic Tac Toe 2.0 book")
+    magic, version, count = BOOK_HEADER.unpack_from(data)
+    if magic != BOOK_MAGIC:
+        raise ValueError(f"{path}: not a Tic Tac Toe 2.0 book")
+    if version != BOOK_VERSION:
+        raise ValueError(f"{path}: book version {version}, expected {BOOK_VERSION}")
+    if len(data) != BOOK_HEADER.size + count * BOOK_RECORD.size:
+        raise ValueError(f"{path}: book is truncated")
+    return {key: move for key, move, _ in BOOK_RECORD.iter_unpack(memoryview(data)[BOOK_HEADER.size:])}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tictactoe2_ai")
+    parser.add_argument("--output", default=BOOK_FILE)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    ai = TicTacToeAI(book_path=None)
+    book = solve(ai)
+    save_book(book, args.output)
+    first_score = book[Position().hash][1]
+    print(f"{len(book)} positions solved in {time.perf_counter() - start:.2f} s "
+          f"({ai.nodes} nodes, first player score {first_score}) -> {args.output}")
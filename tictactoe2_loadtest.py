@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+from perf import run_jobs
+from tictactoe2_net import Client, serve, raise_file_limit, DEFAULT_PORT, END, MOVE, REJECT, DRAW, ABANDONED
+
+# Drives simulated clients playing random legal moves against a server and
+# measures each move's round trip: sent until the server's MOVE echo arrives.
+
+async def play_client(host, port, rng, latencies):
+    client = await Client.connect(host, port)
+    sent = None
+    try:
+        while True:
+            kind, values = await client.receive()
+            if kind == END:
+                return values[0]
+            if kind == REJECT:
+                raise RuntimeError(f"server rejected a move with reason {values[0]}")
+            if kind == MOVE and sent is not None:
+                latencies.append(time.perf_counter() - sent)
+                sent = None
+            if client.my_turn():
+                i, size = rng.choice(client.state.legal_moves())
+                sent = time.perf_counter()
+                client.send_move(i, size)
+    finally:
+        client.close()
+
+async def load_test(host, port, matches, seed):
+    rng = random.Random(seed)
+    latencies = []
+    clients = [play_client(host, port, random.Random(rng.getrandbits(64)), latencies) for _ in range(matches * 2)]
+    results = await asyncio.gather(*clients)
+    return results, latencies
+
+def load_test_batch(job):
+    # Runs matches * 2 clients in this process's own event loop and returns
+    # their results and move latencies
+    host, port, matches, seed = job
+    raise_file_limit()
+    return asyncio.run(load_test(host, port, matches, seed))
+
+def run_server(host, port, ready):
+    raise_file_limit()
+    asyncio.run(serve(host, port, ready))
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def load_test_command(args):
+    raise_file_limit()
+    server = None
+    if args.spawn:
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=run_server, args=(args.host, args.port, ready), daemon=True)
+        server.start()
+        ready.wait()
+    try:
+        jobs = [(args.host, args.port, args.matches * (worker + 1) // args.workers - args.matches * worker // args.workers,
+                 args.seed + worker) for worker in range(args.workers)]
+        start = time.perf_counter()
+        results, latencies = [], []
+        # One job per worker, so every worker's clients are connected at once
+        for batch_results, batch_latencies in run_jobs(load_test_batch, jobs, args.workers):
+            results += batch_results
+            latencies += batch_latencies
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+    # Both clients of a match report the same result
+    decided = [results.count(seat) // 2 for seat in (0, 1)]
+    draws, abandoned = results.count(DRAW) // 2, results.count(ABANDONED) // 2
+    latencies.sort()
+    print(f"{args.matches} concurrent matches, {len(latencies)} moves in {elapsed:.2f} s "
+          f"({len(latencies) / elapsed:.0f} moves/s)")
+    print(f"first seat wins {decided[0]}, second seat wins {decided[1]}, draws {draws}, abandoned {abandoned}")
+    print("move round trip: " + ", ".join(f"p{int(fraction * 100)} {percentile(latencies, fraction) * 1000:.2f} ms"
+                                          for fraction in (0.5, 0.9, 0.99)) +
+          f", max {latencies[-1] * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tictactoe2_loadtest")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--matches", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1, help="client processes; clients may be paired across them")
+    parser.add_argument("--seed", type=int, default=random.randrange(2 ** 32))
+    parser.add_argument("--spawn", action="store_true", help="start a local server in a separate process")
+    load_test_command(parser.parse_args())
@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import struct
+from tictactoe2_rules import Player, TicTacToe, State, SIZES
+
+# Network play for Tic Tac Toe 2.0. The server pairs connections in arrival
+# order and owns the TicTacToe of every match; clients only send moves.
+# Every message is a kind byte plus a fixed payload. After the START
+# snapshot, updates are the accepted move as one byte (cell * 4 + size),
+# which clients apply to their own State.
+
+START, MOVE, REJECT, END = range(4)
+PAYLOADS = {
+    START: struct.Struct("<BQ"),  # your seat, State.pack()
+    MOVE: struct.Struct("<B"),    # cell * 4 + size
+    REJECT: struct.Struct("<B"),  # reason
+    END: struct.Struct("<B"),     # winning seat, DRAW or ABANDONED
+}
+NOT_YOUR_TURN, ILLEGAL_MOVE = range(2)
+DRAW, ABANDONED = 2, 3
+DEFAULT_PORT = 5555
+
+def encode(kind, *values):
+    return bytes([kind]) + PAYLOADS[kind].pack(*values)
+
+async def read_message(reader):
+    kind = (await reader.readexactly(1))[0]
+    payload = PAYLOADS[kind]
+    return kind, payload.unpack(await reader.readexactly(payload.size))
+
+FILE_LIMIT = 65536
+
+def raise_file_limit():
+    # Each client is a socket, so thousands of matches need a high fd limit.
+    # The hard limit may be RLIM_INFINITY (macOS), which setrlimit refuses
+    # as a soft limit, so aim for FILE_LIMIT at most.
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = FILE_LIMIT if hard == resource.RLIM_INFINITY else min(hard, FILE_LIMIT)
+    if soft != resource.RLIM_INFINITY and soft < target:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
+class Match:
+    def __init__(self, writers):
+        self.game = TicTacToe()
+        self.game.add_player(Player("X", None))
+        self.game.add_player(Player("O", None))
+        self.writers = writers
+        self.over = False
+
+    def broadcast(self, data):
+        for writer in self.writers:
+            writer.write(data)
+
+    def move(self, seat, code):
+        # Returns a REJECT reason, or None once the move is played
+        game = self.game
+        if self.over or game.current_turn is not game.players[seat]:
+            return NOT_YOUR_TURN
+        i, size = divmod(code, 4)
+        if i > 8 or not 1 <= size <= 3 or not game.make_move(i // 3, i % 3, SIZES[size - 1]):
+            return ILLEGAL_MOVE
+        self.broadcast(encode(MOVE, code))
+        if game.check_winner():
+            self.finish(seat)
+        else:
+            game.switch_turn()
+            if not game.has_possible_moves():
+                self.finish(DRAW)
+        return None
+
+    def finish(self, result):
+        self.over = True
+        self.broadcast(encode(END, result))
+        # close() still flushes what is buffered
+        for writer in self.writers:
+            writer.close()
+
+class GameServer:
+    def __init__(self):
+        self.waiting = None
+        self.matches = 0
+
+    async def handle(self, reader, writer):
+        if self.waiting is None:
+            future = asyncio.get_running_loop().create_future()
+            self.waiting = (writer, future)
+            # Nothing is due from a waiting client, so any read finishing
+            # first means it hung up (or broke protocol) before being paired
+            hangup = asyncio.ensure_future(reader.read(1))
+            await asyncio.wait([future, hangup], return_when=asyncio.FIRST_COMPLETED)
+            if not future.done():
+                self.waiting = None
+                writer.close()
+                return
+            # The read has to be gone before the match loop reads
+            hangup.cancel()
+            await asyncio.wait([hangup])
+            seat, match = 0, future.result()
+        else:
+            opponent, future = self.waiting
+            self.waiting = None
+            seat, match = 1, Match([opponent, writer])
+            self.matches += 1
+            packed = match.game.state.pack()
+            for player, player_writer in enumerate(match.writers):
+                player_writer.write(encode(START, player, packed))
+            future.set_result(match)
+        try:
+            while not match.over:
+                kind, values = await read_message(reader)
+                if kind != MOVE:
+                    break
+                reason = match.move(seat, values[0])
+                if reason is not None:
+                    writer.write(encode(REJECT, reason))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, struct.error):
+            pass
+        finally:
+            if not match.over:
+                match.finish(ABANDONED)
+            writer.close()
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, ready=None):
+    server = GameServer()
+    listener = await asyncio.start_server(server.handle, host, port, backlog=4096)
+    if ready is not None:
+        ready.set()
+    async with listener:
+        await listener.serve_forever()
+
+class Client:
+    # Mirrors the match from the START snapshot and the MOVE diffs
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.seat = None
+        self.state = None
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=DEFAULT_PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def my_turn(self):
+        state = self.state
+        return (state is not None and state.side == self.seat and state.has_moves()
+                and not state.has_won(1 - self.seat))
+
+    def send_move(self, i, size):
+        self.writer.write(encode(MOVE, i * 4 + size))
+
+    async def receive(self):
+        kind, values = await read_message(self.reader)
+        if kind == START:
+            self.seat = values[0]
+            self.state = State.unpack(values[1])
+        elif kind == MOVE:
+            self.state.play(*divmod(values[0], 4))
+        return kind, values
+
+    def close(self):
+        self.writer.close()
+
+def serve_command(args):
+    raise_file_limit()
+    print(f"serving Tic Tac Toe 2.0 on {args.host}:{args.port}")
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tictactoe2_net")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_command(parser.parse_args())
@@ -0,0 +1,160 @@
+# Bitboard rules for Tic Tac Toe 2.0, free of pygame. Cell i (row-major) is
+# bit i. Only the top piece of a cell matters, since covered pieces never
+# come back.
+
+FULL = 0x1FF
+LINE_MASKS = [0b000000111, 0b000111000, 0b111000000,
+              0b001001001, 0b010010010, 0b100100100,
+              0b100010001, 0b001010100]
+WINNING = [any(board & mask == mask for mask in LINE_MASKS) for board in range(512)]
+SIZES = ["small", "medium", "large"]
+SIZE_RANK = {"small": 1, "medium": 2, "large": 3}
+CELL_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+class State:
+    def __init__(self, pieces=(3, 3, 3)):
+        # owners[p]: cells whose top piece belongs to player p
+        # tops[s]: cells whose top piece has size s (index 0 unused)
+        # pieces[p][s]: pieces of size s player p still holds (up to 15)
+        self.owners = [0, 0]
+        self.tops = [0, 0, 0, 0]
+        self.pieces = [[0] + list(pieces), [0] + list(pieces)]
+        self.side = 0
+
+    def copy(self):
+        state = State.__new__(type(self))
+        state.owners = self.owners[:]
+        state.tops = self.tops[:]
+        state.pieces = [self.pieces[0][:], self.pieces[1][:]]
+        state.side = self.side
+        return state
+
+    def cell(self, i):
+        # 0 when empty, else owner * 3 + size
+        bit = 1 << i
+        if not (self.owners[0] | self.owners[1]) & bit:
+            return 0
+        owner = 1 if self.owners[1] & bit else 0
+        size = 1 if self.tops[1] & bit else 2 if self.tops[2] & bit else 3
+        return owner * 3 + size
+
+    def legal_mask(self, size):
+        # Cells where the side to move may put a piece of this size
+        if not self.pieces[self.side][size]:
+            return 0
+        blocked = self.tops[3]
+        if size < 3:
+            blocked |= self.tops[2]
+        if size < 2:
+            blocked |= self.tops[1]
+        return FULL & ~blocked
+
+    def has_moves(self):
+        return bool(self.legal_mask(1) or self.legal_mask(2) or self.legal_mask(3))
+
+    def legal_moves(self):
+        # Larger pieces and central cells first, which suits search
+        moves = []
+        for size in (3, 2, 1):
+            mask = self.legal_mask(size)
+            if mask:
+                moves += [(i, size) for i in CELL_ORDER if mask >> i & 1]
+        return moves
+
+    def play(self, i, size):
+        # Returns the covered cell code for undo
+        covered = self.cell(i)
+        bit = 1 << i
+        if covered:
+            self.owners[(covered - 1) // 3] &= ~bit
+            self.tops[(covered - 1) % 3 + 1] &= ~bit
+        self.owners[self.side] |= bit
+        self.tops[size] |= bit
+        self.pieces[self.side][size] -= 1
+        self.side = 1 - self.side
+        return covered
+
+    def undo(self, i, size, covered):
+        self.side = 1 - self.side
+        bit = 1 << i
+        self.owners[self.side] &= ~bit
+        self.tops[size] &= ~bit
+        self.pieces[self.side][size] += 1
+        if covered:
+            self.owners[(covered - 1) // 3] |= bit
+            self.tops[(covered - 1) % 3 + 1] |= bit
+
+    def has_won(self, player):
+        return WINNING[self.owners[player]]
+
+    def pack(self):
+        # 61-bit integer: both owner boards, two size planes, six 4-bit
+        # inventory counts and the side to move
+        key = self.owners[0] | self.owners[1] << 9
+        key |= (self.tops[1] | self.tops[3]) << 18 | (self.tops[2] | self.tops[3]) << 27
+        shift = 36
+        for player in range(2):
+            for size in range(1, 4):
+                key |= self.pieces[player][size] << shift
+                shift += 4
+        return key | self.side << 60
+
+    @classmethod
+    def unpack(cls, key):
+        state = cls()
+        state.owners = [key & FULL, key >> 9 & FULL]
+        low, high = key >> 18 & FULL, key >> 27 & FULL
+        state.tops = [0, low & ~high, high & ~low, low & high]
+        shift = 36
+        for player in range(2):
+            for size in range(1, 4):
+                state.pieces[player][size] = key >> shift & 15
+                shift += 4
+        state.side = key >> 60 & 1
+        return state
+
+class Player:
+    def __init__(self, symbol, color, pieces=(3, 3, 3)):
+        self.symbol = symbol
+        self.color = color
+        self.pieces = dict(zip(SIZES, pieces))
+
+class TicTacToe:
+    size_order = {"small": 1, "medium": 2, "large": 3}
+
+    def __init__(self):
+        self.board = [[None for _ in range(3)] for _ in range(3)]
+        self.state = State()
+        self.current_turn = None
+        self.players = []
+
+    def add_player(self, player):
+        self.players.append(player)
+        self.state.pieces[len(self.players) - 1] = [0] + [player.pieces[size] for size in SIZES]
+        if len(self.players) == 1:
+            self.current_turn = player
+
+    def switch_turn(self):
+        self.current_turn = self.players[1] if self.current_turn == self.players[0] else self.players[0]
+
+    def make_move(self, row, col, size):
+        # state.side follows current_turn: make_move flips it and the caller
+        # always switches turns unless the game is over
+        cell = row * 3 + col
+        if self.state.legal_mask(TicTacToe.size_order[size]) >> cell & 1:
+            self.state.play(cell, TicTacToe.size_order[size])
+            self.board[row][col] = (self.current_turn.symbol, size)
+            self.current_turn.pieces[size] -= 1
+            return True
+        return False
+
+    def check_winner(self):
+        if self.state.has_won(self.players.index(self.current_turn)):
+            return self.current_turn
+        return None
+
+    def is_full(self):
+        return (self.state.owners[0] | self.state.owners[1]) == 0x1FF
+
+    def has_possible_moves(self):
+        return self.state.has_moves()
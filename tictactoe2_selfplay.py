@@ -0,0 +1,120 @@
+import argparse
+import multiprocessing
+import random
+import time
+from perf import run_jobs, seeded_jobs
+from tictactoe2_ai import TicTacToeAI
+from tictactoe2_rules import Player, TicTacToe, SIZES, WINNING
+
+# Headless self-play for Tic Tac Toe 2.0. A policy takes the game and returns
+# (row, col, size name) for the player whose turn it is.
+
+def to_move(i, size):
+    return i // 3, i % 3, SIZES[size - 1]
+
+def random_policy(rng):
+    def policy(game):
+        return to_move(*rng.choice(game.state.legal_moves()))
+    return policy
+
+def greedy_policy(rng):
+    # Wins when it can, otherwise takes a cell the opponent would win on,
+    # otherwise plays at random
+    def policy(game):
+        state = game.state
+        moves = state.legal_moves()
+        owned = state.owners[state.side]
+        opponent = state.owners[1 - state.side]
+        wins = [move for move in moves if WINNING[owned | 1 << move[0]]]
+        if wins:
+            return to_move(*rng.choice(wins))
+        blocks = [(i, size) for i, size in moves if WINNING[opponent | 1 << i]]
+        if blocks:
+            # Largest blocking size first, as it is the hardest to cover back
+            largest = blocks[0][1]
+            return to_move(*rng.choice([move for move in blocks if move[1] == largest]))
+        return to_move(*rng.choice(moves))
+    return policy
+
+_ai = None
+
+def search_policy(rng):
+    # One AI per process so the transposition table carries across games
+    global _ai
+    if _ai is None:
+        _ai = TicTacToeAI()
+    return _ai.best_move
+
+POLICIES = {"random": random_policy, "greedy": greedy_policy, "search": search_policy}
+
+def play_game(policies, pieces):
+    # Returns (winner seat or None for a draw, plies played)
+    game = TicTacToe()
+    game.add_player(Player("X", None, pieces))
+    game.add_player(Player("O", None, pieces))
+    plies = 0
+    while True:
+        seat = game.players.index(game.current_turn)
+        row, col, size = policies[seat](game)
+        if not game.make_move(row, col, size):
+            raise ValueError(f"illegal move {row, col, size} by seat {seat}")
+        plies += 1
+        if game.check_winner():
+            return seat, plies
+        game.switch_turn()
+        if not game.has_possible_moves():
+            return None, plies
+
+def play_batch(job):
+    # Pits the two policies against each other count times and tallies
+    # outcomes by seat and game lengths by ply count
+    seed, count, first, second, pieces = job
+    rng = random.Random(seed)
+    policies = [POLICIES[first](rng), POLICIES[second](rng)]
+    results = [0, 0, 0]
+    lengths = {}
+    for _ in range(count):
+        winner, plies = play_game(policies, pieces)
+        results[2 if winner is None else winner] += 1
+        lengths[plies] = lengths.get(plies, 0) + 1
+    return count, results, lengths
+
+def self_play(games, workers, seed, first, second, pieces, batch_size=1000):
+    return run_jobs(play_batch, seeded_jobs(seed, games, batch_size, first, second, pieces), workers)
+
+def self_play_command(args):
+    start = time.perf_counter()
+    played = 0
+    results = [0, 0, 0]
+    lengths = {}
+    pieces = tuple(args.pieces)
+    for count, batch_results, batch_lengths in self_play(args.games, args.workers, args.seed,
+                                                         args.first, args.second, pieces):
+        played += count
+        for outcome in range(3):
+            results[outcome] += batch_results[outcome]
+        for plies, games in batch_lengths.items():
+            lengths[plies] = lengths.get(plies, 0) + games
+    elapsed = time.perf_counter() - start
+    first_wins, second_wins, draws = results
+    print(f"{played} games of {args.first} vs {args.second} with pieces "
+          f"{'/'.join(map(str, pieces))} in {elapsed:.2f} s ({played / elapsed:.0f} games/s)")
+    print(f"first player wins: {first_wins / played:.2%}, second player wins: {second_wins / played:.2%}, "
+          f"draws: {draws / played:.2%}")
+    decided = first_wins + second_wins
+    if decided:
+        print(f"first-player advantage: {(first_wins - second_wins) / played:+.2%} "
+              f"({first_wins / decided:.2%} of decided games)")
+    mean = sum(plies * count for plies, count in lengths.items()) / played
+    print(f"game length: mean {mean:.2f} plies, min {min(lengths)}, max {max(lengths)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="tictactoe2_selfplay")
+    parser.add_argument("--first", choices=list(POLICIES), default="random")
+    parser.add_argument("--second", choices=list(POLICIES), default="random")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=random.randrange(2 ** 32))
+    parser.add_argument("--pieces", type=int, nargs=3, default=[3, 3, 3], metavar=("SMALL", "MEDIUM", "LARGE"),
+                        help="pieces of each size per player (at most 15)")
+    self_play_command(parser.parse_args())